@@ -0,0 +1,31 @@
+"""
+Surface Kinetic Model evaluation on arrays of precipitation rates.
+"""
+import numpy as np
+
+from otools.geochem.SKM import SKM, calc_Rb_m2
+
+
+class SurfaceKineticModel:
+    params = ([10**3, 10**5, 10**6], [1, 2])
+    param_names = ['N', 'mode']
+
+    def setup(self, N, mode):
+        self.Rp = np.logspace(-9, -4, N)
+
+    def time_SKM(self, N, mode):
+        SKM(self.Rp, 1., 0.1, 6e-7, mode=mode)
+
+    def peakmem_SKM(self, N, mode):
+        SKM(self.Rp, 1., 0.1, 6e-7, mode=mode)
+
+
+class CalcRbM2:
+    params = [10**3, 10**5, 10**6]
+    param_names = ['N']
+
+    def setup(self, N):
+        self.Rp = np.logspace(-9, -4, N)
+
+    def time_calc_Rb_m2(self, N):
+        calc_Rb_m2(self.Rp)
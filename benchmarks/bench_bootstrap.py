@@ -0,0 +1,24 @@
+"""
+Random resampling of input distributions.
+"""
+from scipy import stats
+
+from otools.bootstrap import resample
+
+
+class Resample:
+    params = ([10**3, 10**5, 10**6], [1, 10])
+    param_names = ['N', 'nvars']
+
+    def setup(self, N, nvars):
+        self.tuples = [(i, 0.1 * (i + 1)) for i in range(nvars)]
+        self.dists = [stats.uniform(i, 1) for i in range(nvars)]
+
+    def time_resample_tuples(self, N, nvars):
+        resample(N, *self.tuples, random_state=0)
+
+    def time_resample_distributions(self, N, nvars):
+        resample(N, *self.dists, random_state=0)
+
+    def peakmem_resample_tuples(self, N, nvars):
+        resample(N, *self.tuples, random_state=0)
@@ -0,0 +1,57 @@
+"""
+Molecular weight calculations.
+"""
+from otools.chemistry import calc_M, decompose_molecule, isotope_patterns
+
+molecules = ['CaCO3', 'B(OH)4', 'MgSO4', 'NaHCO3', 'CO2', 'Ca5(PO4)3OH', 'SrCO3', 'Mg(OH)2']
+
+
+class CalcM:
+    params = [1, 100]
+    param_names = ['nmolecules']
+
+    def setup(self, nmolecules):
+        self.molecules = [molecules[i % len(molecules)] for i in range(nmolecules)]
+
+    def time_calc_M(self, nmolecules):
+        for m in self.molecules:
+            calc_M(m)
+
+    def time_decompose_molecule(self, nmolecules):
+        for m in self.molecules:
+            decompose_molecule(m)
+
+    def peakmem_calc_M(self, nmolecules):
+        for m in self.molecules:
+            calc_M(m)
+
+
+class LoadTables:
+    """
+    Uncached loads of the element data files.
+    """
+    def setup(self):
+        from otools import chemistry
+        self.chemistry = chemistry
+
+    def time_elements(self):
+        self.chemistry._load_elements.cache_clear()
+        self.chemistry.elements()
+
+    def time_periodic_table(self):
+        self.chemistry._load_periodic_table.cache_clear()
+        self.chemistry.periodic_table()
+
+    def time_periodic_table_cached(self):
+        self.chemistry.periodic_table()
+
+
+class IsotopePatterns:
+    params = ([100, 1000], [None, 1])
+    param_names = ['nmolecules', 'resolution']
+
+    def setup(self, nmolecules, resolution):
+        self.molecules = [f'C{2 + i % 40}H{4 + i % 57}O{i % 11}N{i % 3}' for i in range(nmolecules)]
+
+    def time_isotope_patterns(self, nmolecules, resolution):
+        isotope_patterns(self.molecules, threshold=1e-5, resolution=resolution)
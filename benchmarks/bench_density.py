@@ -0,0 +1,25 @@
+"""
+Binned FFT kernel density estimates of MCMC samples.
+"""
+import numpy as np
+
+from otools.mcmc.density import kde1d, kde2d
+
+
+class KDE:
+    params = [10**4, 10**6]
+    param_names = ['N']
+
+    def setup(self, N):
+        rng = np.random.default_rng(0)
+        self.x = rng.normal(size=N)
+        self.y = 0.5 * self.x + rng.normal(size=N)
+
+    def time_kde1d(self, N):
+        kde1d(self.x)
+
+    def time_kde2d(self, N):
+        kde2d(self.x, self.y)
+
+    def peakmem_kde2d(self, N):
+        kde2d(self.x, self.y)
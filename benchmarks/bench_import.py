@@ -0,0 +1,56 @@
+"""
+Import time of otools and its subpackages, each in a fresh interpreter.
+
+Guards against heavy dependencies creeping back into module-level imports.
+Uses asv's timeraw_* benchmarks. The check_* methods fail if a bare import
+loads any `forbidden` module or takes longer than `max_time`, and are run
+by `python -m benchmarks.run`, or directly:
+    python -m benchmarks.bench_import
+"""
+import subprocess
+import sys
+import time
+
+modules = ['otools', 'otools.geochem', 'otools.mcmc', 'otools.phreeqc', 'otools.plotting']
+
+# heavy dependencies that should not be loaded by a bare import of each module
+forbidden = ['matplotlib', 'corner', 'emcee', 'tqdm', 'phreeqpy', 'pkg_resources', 'scipy']
+
+# seconds. Generous, as numpy alone takes ~0.1 s to import.
+max_time = 1.0
+
+
+class ImportTime:
+    params = modules
+    param_names = ['module']
+
+    def timeraw_import(self, module):
+        return f'import {module}'
+
+    def check_import(self, module):
+        t, loaded = check_import(module)
+        assert not loaded, f'import {module} loads {", ".join(loaded)}'
+        assert t < max_time, f'import {module} took {t:.2f} s (max {max_time} s)'
+
+
+def check_import(module):
+    """
+    Import module in a fresh interpreter, returning (time, heavy modules loaded).
+    """
+    code = (f'import sys, time; t0 = time.perf_counter(); import {module}; '
+            f't = time.perf_counter() - t0; '
+            f'print(t); print(*[m for m in {forbidden!r} if m in sys.modules])')
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    t, loaded = out.stdout.split('\n')[:2]
+    return float(t), loaded.split()
+
+
+if __name__ == '__main__':
+    failed = 0
+    for module in modules:
+        t, loaded = check_import(module)
+        ok = not loaded and t < max_time
+        failed += not ok
+        print(f'{module:18s} {1e3 * t:7.1f} ms   heavy imports: {", ".join(loaded) or "none"}'
+              + ('' if ok else '  <-- FAILED'))
+    sys.exit(1 if failed else 0)
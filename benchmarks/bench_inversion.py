@@ -0,0 +1,59 @@
+"""
+Batched SKM inversion vs. per-dataset scipy.optimize.minimize.
+
+Written in asv style (time_* methods), but can also be run directly:
+    python -m benchmarks.bench_inversion
+"""
+import time
+import numpy as np
+from scipy.optimize import minimize
+
+from otools.geochem.SKM import SKM
+from otools.geochem.inversion import fit_SKM
+
+
+def make_datasets(ndatasets, npoints=25, seed=0):
+    rng = np.random.default_rng(seed)
+    Rp = np.logspace(-9, -4, npoints)
+    p = np.stack([rng.uniform(0.5, 2, ndatasets),
+                  rng.uniform(0.01, 0.3, ndatasets),
+                  rng.uniform(2e-7, 2e-6, ndatasets)], -1)
+    Kp = SKM(Rp, *(p[:, i, np.newaxis] for i in range(3)))
+    Kp *= rng.normal(1, 0.01, Kp.shape)
+    return Rp, Kp, 0.01 * Kp
+
+
+def minimize_loop(Rp, Kp, sigma):
+    # Rb is rescaled so all parameters are O(1) for the optimizer
+    def chi2(q, kp, s):
+        return np.sum(((kp - SKM(Rp, q[0], q[1], q[2] * 1e-7)) / s)**2)
+    return np.array([minimize(chi2, (1, 0.1, 6), args=(kp, s)).x for kp, s in zip(Kp, sigma)])
+
+
+class SKMInversion:
+    params = [10, 100, 1000]
+    param_names = ['ndatasets']
+
+    def setup(self, ndatasets):
+        self.Rp, self.Kp, self.sigma = make_datasets(ndatasets)
+
+    def time_fit_SKM(self, ndatasets):
+        fit_SKM(self.Rp, self.Kp, self.sigma)
+
+    def time_minimize_loop(self, ndatasets):
+        minimize_loop(self.Rp, self.Kp, self.sigma)
+
+
+if __name__ == '__main__':
+    for ndatasets in SKMInversion.params:
+        Rp, Kp, sigma = make_datasets(ndatasets)
+
+        t0 = time.perf_counter()
+        minimize_loop(Rp, Kp, sigma)
+        t_loop = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        fit_SKM(Rp, Kp, sigma)
+        t_batch = time.perf_counter() - t0
+
+        print(f'{ndatasets:6d} datasets : minimize {t_loop:.2f} s, fit_SKM {t_batch:.3f} s ({t_loop / t_batch:.0f}x)')
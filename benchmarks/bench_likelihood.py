@@ -0,0 +1,27 @@
+"""
+Gaussian log-likelihoods used by the MCMC helpers.
+"""
+import numpy as np
+
+from otools.mcmc.likelihood import log_likelihood, poly_log_likelihood
+
+
+class LogLikelihood:
+    params = [10**2, 10**4, 10**6]
+    param_names = ['N']
+
+    def setup(self, N):
+        rng = np.random.default_rng(0)
+        self.x = np.linspace(0, 1, N)
+        self.obs = 2 * self.x + 1 + rng.normal(0, 0.1, N)
+        self.pred = 2 * self.x + 1
+        self.err = np.full(N, 0.1)
+
+    def time_log_likelihood(self, N):
+        log_likelihood(self.pred, self.obs, self.err)
+
+    def time_poly_log_likelihood(self, N):
+        poly_log_likelihood([2, 1], self.x, self.obs, self.err)
+
+    def peakmem_log_likelihood(self, N):
+        log_likelihood(self.pred, self.obs, self.err)
@@ -0,0 +1,50 @@
+"""
+Parsing full PHREEQC output files.
+
+fixtures/phreeqc/pitzer.out holds two initial solutions and a two-step
+reaction, run with the pitzer database. It is repeated to make larger files.
+"""
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from otools.phreeqc.output import read_output
+
+fixture = os.path.join(os.path.dirname(__file__), 'fixtures', 'phreeqc', 'pitzer.out')
+
+
+class ReadOutput:
+    params = [1, 1000]
+    param_names = ['repeats']
+
+    def setup(self, repeats):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'phreeqc.out')
+        with open(fixture, 'rb') as f:
+            text = f.read()
+        with open(self.path, 'wb') as f:
+            for _ in range(repeats):
+                f.write(text)
+
+    def teardown(self, repeats):
+        shutil.rmtree(self.dir)
+
+    def time_read_output(self, repeats):
+        read_output(self.path)
+
+    def peakmem_read_output(self, repeats):
+        read_output(self.path)
+
+
+class ChunkedOutput:
+    def check_chunked(self):
+        """
+        Reading in small chunks gives the same tables, with the same dtypes.
+        """
+        whole = read_output(fixture)
+        for chunk_rows in (1, 7):
+            chunked = read_output(fixture, chunk_rows=chunk_rows)
+            for t in whole:
+                pd.testing.assert_frame_equal(whole[t], chunked[t])
@@ -0,0 +1,61 @@
+"""
+Batch peak fitting vs. a naive serial curve_fit loop.
+
+Written in asv style (time_* methods), but can also be run directly:
+    python -m benchmarks.bench_peakfit
+"""
+import time
+import numpy as np
+from scipy.optimize import curve_fit
+
+from otools.peakfit import fit_peaks
+from otools.peakshapes import gaussian
+
+
+def make_spectra(nspectra, n=200, seed=0):
+    """Gaussian peaks that drift slowly from spectrum to spectrum, plus noise."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(-10, 10, n)
+    t = np.linspace(0, 1, nspectra)[:, np.newaxis]
+    Y = gaussian(x, 10 + 2 * t, 3 * np.sin(2 * np.pi * t), 2 + t)
+    Y += rng.normal(0, 0.01, Y.shape)
+    return x, Y
+
+
+def naive_loop(x, Y, p0):
+    return np.array([curve_fit(gaussian, x, y, p0=p0)[0] for y in Y])
+
+
+class PeakFit:
+    params = [100, 1000]
+    param_names = ['nspectra']
+
+    def setup(self, nspectra):
+        self.x, self.Y = make_spectra(nspectra)
+        self.p0 = [5, 0, 1]
+
+    def time_naive_loop(self, nspectra):
+        naive_loop(self.x, self.Y, self.p0)
+
+    def time_fit_peaks_serial(self, nspectra):
+        fit_peaks(self.x, self.Y, 'gaussian', self.p0, nproc=1)
+
+    def time_fit_peaks_parallel(self, nspectra):
+        fit_peaks(self.x, self.Y, 'gaussian', self.p0)
+
+
+if __name__ == '__main__':
+    for nspectra in PeakFit.params:
+        x, Y = make_spectra(nspectra)
+        p0 = [5, 0, 1]
+
+        t0 = time.perf_counter()
+        naive = naive_loop(x, Y, p0)
+        t_naive = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        params, covs, times, success = fit_peaks(x, Y, 'gaussian', p0)
+        t_batch = time.perf_counter() - t0
+
+        print(f'{nspectra:6d} spectra : naive {t_naive:.2f} s, fit_peaks {t_batch:.2f} s '
+              f'({t_naive / t_batch:.1f}x), max param diff {np.nanmax(abs(naive - params)):.1e}')
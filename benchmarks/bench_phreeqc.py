@@ -0,0 +1,48 @@
+"""
+PHREEQC input generation and runs.
+
+If no IPhreeqc library can be loaded, run_phreeqc is benchmarked against
+`phreeqc_stub.StubIPhreeqc`, which only measures the Python side.
+"""
+import numpy as np
+
+from otools.phreeqc.phreeq import input_str, run_phreeqc
+
+from .phreeqc_stub import phreeq_path
+
+
+def make_inputs(nsolutions, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'pH': rng.normal(8.1, 0.05), 'temp': 25., 'units': 'mmol/kgw',
+             'Na': 470., 'Cl': 545., 'C': rng.normal(2, 0.05)}
+            for _ in range(nsolutions)]
+
+
+class InputStr:
+    params = [10, 1000, 10000]
+    param_names = ['nsolutions']
+
+    def setup(self, nsolutions):
+        self.inputs = make_inputs(nsolutions)
+
+    def time_input_str(self, nsolutions):
+        input_str(self.inputs)
+
+    def peakmem_input_str(self, nsolutions):
+        input_str(self.inputs)
+
+
+class RunPhreeqc:
+    params = [10, 1000]
+    param_names = ['nsolutions']
+    timeout = 300
+
+    def setup(self, nsolutions):
+        self.phreeq_path = phreeq_path()
+        self.input = input_str(make_inputs(nsolutions))
+
+    def time_run_phreeqc(self, nsolutions):
+        run_phreeqc(self.input, database='pitzer', phreeq_path=self.phreeq_path)
+
+    def peakmem_run_phreeqc(self, nsolutions):
+        run_phreeqc(self.input, database='pitzer', phreeq_path=self.phreeq_path)
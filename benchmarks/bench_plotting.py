@@ -0,0 +1,42 @@
+"""
+Rendering points with errors as stacked 2D gaussians, and aggregating large scatter datasets.
+"""
+import numpy as np
+
+from otools.plotting.gaussplot import gaussplot
+from otools.plotting.raster import aggregate
+
+
+class GaussPlot:
+    params = ([10, 100], [100, 500])
+    param_names = ['npoints', 'n']
+
+    def setup(self, npoints, n):
+        rng = np.random.default_rng(0)
+        self.x = rng.normal(0, 1, npoints)
+        self.y = rng.normal(0, 1, npoints)
+        self.xe = rng.uniform(0.05, 0.2, npoints)
+        self.ye = rng.uniform(0.05, 0.2, npoints)
+
+    def time_gaussplot(self, npoints, n):
+        gaussplot(self.x, self.y, self.xe, self.ye, n=n)
+
+    def peakmem_gaussplot(self, npoints, n):
+        gaussplot(self.x, self.y, self.xe, self.ye, n=n)
+
+
+class Aggregate:
+    params = ([10**5, 10**7], ['count', 'mean'])
+    param_names = ['npoints', 'how']
+
+    def setup(self, npoints, how):
+        rng = np.random.default_rng(0)
+        self.x = rng.normal(0, 1, npoints)
+        self.y = rng.normal(0, 1, npoints)
+        self.z = self.x + self.y
+
+    def time_aggregate(self, npoints, how):
+        aggregate(self.x, self.y, self.z, how=how)
+
+    def peakmem_aggregate(self, npoints, how):
+        aggregate(self.x, self.y, self.z, how=how)
@@ -0,0 +1,32 @@
+"""
+Scraping isotope pages from a local stand-in server (see scraper_fixture).
+"""
+import shutil
+import tempfile
+
+from otools.periodic_table.element_scraper import scrape
+
+from .scraper_fixture import start_server
+
+
+class Scrape:
+    def setup(self):
+        self.server, self.url = start_server()
+        self.cache = tempfile.mkdtemp()
+        scrape(self.url, self.cache)
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache)
+
+    def time_scrape_cold(self):
+        cache = tempfile.mkdtemp()
+        scrape(self.url, cache)
+        shutil.rmtree(cache)
+
+    def time_scrape_revalidate(self):
+        scrape(self.url, self.cache)
+
+    def time_scrape_offline(self):
+        scrape(self.url, self.cache, offline=True)
@@ -0,0 +1,17 @@
+"""
+Sobol sensitivity indices of the SKM, with (N * 6) model evaluations.
+"""
+from otools.geochem.sensitivity import sobol_indices
+
+inputs = {'Rp': (1e-6, 2e-7), 'Kf': (0.03, 0.003), 'Keq': (0.01, 0.001), 'Rb': (6e-7, 1e-7)}
+
+
+class SobolSKM:
+    params = [2**14, 2**18, 2**21]
+    param_names = ['N']
+
+    def time_sobol_indices(self, N):
+        sobol_indices('SKM', inputs, N=N, random_state=0)
+
+    def peakmem_sobol_indices(self, N):
+        sobol_indices('SKM', inputs, N=N, random_state=0)
@@ -0,0 +1,87 @@
+"""
+A stand-in for phreeqpy's IPhreeqc, for benchmarking without libiphreeqc.
+
+`find_iphreeqc` looks for a working IPhreeqc library. If none is found,
+`install_stub` replaces `phreeqpy.iphreeqc.phreeqc_dll.IPhreeqc` with
+`StubIPhreeqc`. The stub reads the database and counts the solutions in
+the input string, then returns a selected output array of the right
+shape. Benchmarks of `run_phreeqc` then measure the Python overhead
+(database lookup, string handling, DataFrame conversion) instead of
+failing.
+"""
+import re
+import sys
+import types
+
+default_paths = ['/usr/local/lib/libiphreeqc.so', None]
+
+
+def find_iphreeqc(paths=default_paths):
+    """
+    Return the first path that loads as an IPhreeqc library, or False.
+
+    A path of None means the library bundled with phreeqpy.
+    """
+    try:
+        from phreeqpy.iphreeqc.phreeqc_dll import IPhreeqc
+    except ImportError:
+        return False
+    for path in paths:
+        try:
+            IPhreeqc(path)
+            return path
+        except Exception:
+            continue
+    return False
+
+
+class StubIPhreeqc:
+    """
+    Mimics the parts of the IPhreeqc interface used by `run_phreeqc`.
+    """
+    columns = ['sim', 'state', 'soln', 'dist_x', 'time', 'step', 'pH', 'pe']
+
+    def __init__(self, dll_path=None):
+        self.database = None
+        self.rows = []
+
+    def load_database(self, database):
+        with open(database, encoding='latin-1') as f:
+            self.database = f.read()
+
+    def set_output_file_on(self):
+        pass
+
+    def run_string(self, input_string):
+        solns = re.findall(r'^SOLUTION\s+(\d+)', input_string, flags=re.M)
+        self.rows = [[1, 'i_soln', int(n), -99, -99, -99, 8.0, 4.0] for n in solns]
+
+    def get_selected_output_array(self):
+        return [list(self.columns)] + self.rows
+
+
+def install_stub():
+    """
+    Make `run_phreeqc` use `StubIPhreeqc`, whether or not phreeqpy is installed.
+    """
+    try:
+        import phreeqpy.iphreeqc.phreeqc_dll as mod
+    except ImportError:
+        mod = types.ModuleType('phreeqpy.iphreeqc.phreeqc_dll')
+        for name in ['phreeqpy', 'phreeqpy.iphreeqc']:
+            sys.modules.setdefault(name, types.ModuleType(name))
+        sys.modules['phreeqpy.iphreeqc.phreeqc_dll'] = mod
+        sys.modules['phreeqpy.iphreeqc'].phreeqc_dll = mod
+        sys.modules['phreeqpy'].iphreeqc = sys.modules['phreeqpy.iphreeqc']
+    mod.IPhreeqc = StubIPhreeqc
+
+
+def phreeq_path():
+    """
+    The IPhreeqc library to benchmark with, installing the stub if there is none.
+    """
+    path = find_iphreeqc()
+    if path is False:
+        install_stub()
+        return None
+    return path
@@ -0,0 +1,142 @@
+"""
+Minimal runner for the asv-style benchmarks in this directory, for when
+asv is not available:
+
+    python -m benchmarks.run                    # everything
+    python -m benchmarks.run SKM phreeqc        # benchmarks matching any pattern
+    python -m benchmarks.run --save base.json   # save results
+    python -m benchmarks.run --compare base.json --threshold 1.2
+
+time_* methods report the best of `--repeat` runs. peakmem_* methods
+report the peak memory traced by tracemalloc during one call, which
+covers numpy allocations but not memory held by C libraries such as
+IPhreeqc. check_* methods are run once, and fail if they raise (e.g.
+an AssertionError). The exit status is 1 if any check fails or, with
+--compare, if any benchmark is slower (or uses more memory) than the
+saved result by more than `--threshold` times.
+"""
+import sys
+import json
+import time
+import inspect
+import argparse
+import importlib
+import itertools
+import pkgutil
+import tracemalloc
+
+import benchmarks
+
+
+def _classes():
+    for mod in pkgutil.iter_modules(benchmarks.__path__):
+        if not mod.name.startswith('bench_'):
+            continue
+        module = importlib.import_module(f'benchmarks.{mod.name}')
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ == module.__name__:
+                yield mod.name, name, cls
+
+
+def _param_sets(cls):
+    params = getattr(cls, 'params', None)
+    if params is None:
+        return [()]
+    if not params or not isinstance(params[0], (list, tuple)):
+        params = [params]
+    return list(itertools.product(*params))
+
+
+def run_one(cls, method, args, repeat):
+    obj = cls()
+    if hasattr(obj, 'setup'):
+        obj.setup(*args)
+    fn = getattr(obj, method)
+    try:
+        if method.startswith('check_'):
+            fn(*args)
+            return True
+        if method.startswith('peakmem_'):
+            tracemalloc.start()
+            fn(*args)
+            return tracemalloc.get_traced_memory()[1]
+        best = float('inf')
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn(*args)
+            best = min(best, time.perf_counter() - t0)
+        return best
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if hasattr(obj, 'teardown'):
+            obj.teardown(*args)
+
+
+def _fmt(method, value):
+    if value is None:
+        return 'failed'
+    if method.startswith('check_'):
+        return f'{"ok":>13s}'
+    if method.startswith('peakmem_'):
+        return f'{value / 2**20:10.2f} MiB'
+    return f'{value * 1e3:10.3f} ms'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('patterns', nargs='*', help='Only run benchmarks whose name contains one of these.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='Save results to this JSON file.')
+    parser.add_argument('--compare', help='Compare against results saved with --save.')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    failures = []
+    for modname, clsname, cls in _classes():
+        methods = [m for m in dir(cls) if m.startswith(('time_', 'peakmem_', 'check_'))]
+        for method, params in itertools.product(methods, _param_sets(cls)):
+            key = f'{modname}.{clsname}.{method}({", ".join(map(str, params))})'
+            if args.patterns and not any(p in key for p in args.patterns):
+                continue
+            try:
+                value = run_one(cls, method, params, args.repeat)
+            except Exception as e:
+                value = None
+                print(f'{key}: {type(e).__name__}: {e}', file=sys.stderr)
+            if method.startswith('check_'):
+                if value is None:
+                    failures.append(key)
+                print(f'{key:70s} {_fmt(method, value)}', flush=True)
+                continue
+            results[key] = value
+
+            line = f'{key:70s} {_fmt(method, value)}'
+            old = baseline.get(key)
+            if old and value:
+                ratio = value / old
+                line += f'   {ratio:5.2f}x'
+                if ratio > args.threshold:
+                    line += '  <-- regression'
+                    regressions.append(key)
+            print(line, flush=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+    if failures:
+        print(f'\n{len(failures)} checks failed.', file=sys.stderr)
+    if regressions:
+        print(f'\n{len(regressions)} regressions beyond {args.threshold}x.', file=sys.stderr)
+    return 1 if failures or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
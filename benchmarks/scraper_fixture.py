@@ -0,0 +1,104 @@
+"""
+A local stand-in for periodictable.com, for testing and benchmarking the element scraper.
+
+`start_server` serves the fixture pages in fixtures/periodictable with
+http.server, which answers If-Modified-Since requests with 304, so the
+scraper's conditional GET path is exercised as well as full downloads.
+`check` scrapes the fixtures and verifies the parsed table against
+`otools.chemistry.elements`, and the page statuses of a cold scrape, a
+re-validation, a changed page and an offline re-parse:
+
+    python -m benchmarks.scraper_fixture
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import functools
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'periodictable')
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_server(directory=fixture_dir):
+    """
+    Serve directory on a free local port, in a background thread.
+
+    Returns
+    -------
+    (server, base_url) : call server.shutdown() to stop. base_url is the
+        directory holding the index page, as expected by `scrape`.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/Properties/A/'
+
+
+def _check_table(df):
+    from otools.chemistry import elements
+
+    ref = elements()
+    ref = ref.merge(df[['element', 'isotope']], on=['element', 'isotope']).sort_values(['atomic_number', 'isotope'])
+    assert len(df) == 7 and len(ref) == 7, f'Expected 7 isotopes, got {len(df)}.'
+    assert list(df.columns) == list(ref.columns)
+    assert (df.element.values == ref.element.values).all()
+    assert (df.isotope.values == ref.isotope.values).all()
+    np.testing.assert_allclose(df[['atomic_number', 'atomic_weight', 'percent']].values,
+                               ref[['atomic_number', 'atomic_weight', 'percent']].values)
+
+
+def check(verbose=True):
+    """
+    Scrape the fixture pages, and check the parsed table and cache behaviour.
+
+    Raises AssertionError if anything is wrong.
+    """
+    from otools.periodic_table.element_scraper import scrape
+
+    work = tempfile.mkdtemp()
+    pages = os.path.join(work, 'pages')
+    shutil.copytree(fixture_dir, pages)
+    cache = os.path.join(work, 'cache')
+    server, url = start_server(pages)
+    try:
+        df = scrape(url, cache)
+        _check_table(df)
+        assert df.attrs['status'] == {'200': 7}, df.attrs['status']
+
+        df = scrape(url, cache)
+        _check_table(df)
+        assert df.attrs['status'] == {'304': 7}, df.attrs['status']
+
+        # a page changed on the server is downloaded again, the rest re-validated
+        page = os.path.join(pages, 'Isotopes', '009.19', 'index.html')
+        future = time.time() + 60
+        os.utime(page, (future, future))
+        df = scrape(url, cache)
+        assert df.attrs['status'] == {'304': 6, '200': 1}, df.attrs['status']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    df = scrape(url, cache, offline=True)
+    _check_table(df)
+    assert df.attrs['status'] == {'cached': 7}, df.attrs['status']
+    shutil.rmtree(work)
+    if verbose:
+        print('element scraper: fixture table and cache statuses OK')
+
+
+if __name__ == '__main__':
+    try:
+        check()
+    except AssertionError as e:
+        print(f'element scraper check failed: {e}', file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,23 @@
+"""
+Oscar's Python Tools.
+
+Submodules are imported on first attribute access (PEP 562), so that
+`import otools` is cheap and heavy dependencies (matplotlib, emcee,
+phreeqpy...) are only loaded by the parts of the package that need them.
+"""
+from importlib import import_module as _import_module
+
+_submodules = ['bootstrap', 'chemistry', 'geochem', 'linprop', 'mcmc', 'peakfit',
+               'peakshapes', 'phreeqc', 'plotting', 'profiling', 'seawater']
+
+__all__ = list(_submodules)
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return _import_module('.' + name, __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + _submodules)
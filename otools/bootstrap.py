@@ -1,8 +1,11 @@
 import numpy as np
 from scipy import stats
 
+from .profiling import instrument
 
-def resample(N, *it):
+
+@instrument('bootstrap.resample')
+def resample(N, *it, random_state=None):
     """
     Returns N samples from all values.
 
@@ -14,6 +17,8 @@ def resample(N, *it):
         If a distribution object, samples the distribution directly.
         If a tuple, takes the first value as the mean and the second
         as the standard deviation for sampling.
+    random_state : None, int or numpy.random.Generator
+        Passed to the `rvs` method of each distribution.
     
     Returns
     -------
@@ -24,9 +29,11 @@ def resample(N, *it):
     elif isinstance(N, (tuple, list, np.ndarray)):
         N = np.array(N, dtype=int)
 
+    random_state = np.random.default_rng(random_state) if random_state is not None else None
+
     out = []
     for i in it:
         if isinstance(i, tuple):
             i = stats.norm(i[0], i[1])
-        out.append(i.rvs(N))
+        out.append(i.rvs(N, random_state=random_state))
     return np.array(out)
\ No newline at end of file
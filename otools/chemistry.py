@@ -1,45 +1,211 @@
 """
 The periodic table, and all it's info! And functions for doing chemical things.
+
+Element data are stored as uncompressed .npz files of typed columns, which
+load without pickle and can be memory-mapped.
 """
-import os
 import re
-import pickle
+import zipfile
+import functools
+import importlib.resources as resources
+import numpy as np
 import pandas as pd
 
+package_path = resources.files('otools') / 'periodic_table'
+
+# column dtypes of elements.npz
+elements_schema = {'element': '<U3',
+                   'atomic_number': '<f8',
+                   'isotope': '<i8',
+                   'atomic_weight': '<f8',
+                   'percent': '<f8'}
+
+# value kinds in periodic_table.npz
+_FLOAT, _STR, _EMPTY = 0, 1, 2
+
+
+def load_npz(path, mmap_mode=None):
+    """
+    Load all arrays from an .npz file, without allowing pickles.
+
+    Parameters
+    ----------
+    path : str
+        Path to an .npz file.
+    mmap_mode : str
+        If given (e.g. 'r'), arrays stored uncompressed are memory-mapped
+        from the file, instead of read into memory.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+    """
+    if mmap_mode is None:
+        with np.load(path, allow_pickle=False) as f:
+            return {k: f[k] for k in f.files}
+
+    out = {}
+    with zipfile.ZipFile(path) as z, open(path, 'rb') as f:
+        for info in z.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                out[name] = np.load(z.open(info), allow_pickle=False)
+                continue
+            # skip the zip local file header (30 bytes + name + extra)
+            f.seek(info.header_offset + 26)
+            n, m = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + int(n) + int(m))
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            out[name] = np.memmap(f, dtype=dtype, mode=mmap_mode, shape=shape,
+                                  order='F' if fortran else 'C', offset=f.tell())
+    return out
+
+
+def _resource(name, mmap_mode=None):
+    with resources.as_file(package_path / name) as path:
+        return load_npz(path, mmap_mode=mmap_mode)
+
+
+def save_elements(df, path):
+    """
+    Save an isotope table (as returned by `elements`) to .npz.
+    """
+    np.savez(path, **{c: np.asarray(df[c], dtype=t) for c, t in elements_schema.items()})
+
+
+@functools.lru_cache()
+def _load_elements(mmap_mode=None):
+    return pd.DataFrame(_resource('elements.npz', mmap_mode), columns=list(elements_schema))
+
 
-def elements(all_isotopes=True):
+def elements(all_isotopes=True, mmap_mode=None):
     """
     Loads a DataFrame of all elements and isotopes.
 
     Scraped from https://www.webelements.com/
 
+    Parameters
+    ----------
+    all_isotopes : bool
+        If False, return the abundance-weighted atomic weight of each element.
+    mmap_mode : str
+        Passed to `load_npz`.
+
     Returns
     -------
     pandas DataFrame with columns (element, atomic_number, isotope, atomic_weight, percent)
     """
-    el = pd.read_pickle(os.path.dirname(__file__) + '/periodic_table/elements.pkl')
+    el = _load_elements(mmap_mode).copy()
     if all_isotopes:
         return el
     else:
-        def wmean(g):
-            return (g.atomic_weight * g.percent).sum() / 100
-        iel = el.groupby('element').apply(wmean)
-        iel.name = 'atomic_weight'
-        return iel
+        return _atomic_weights().copy()
+
+
+@functools.lru_cache()
+def _atomic_weights():
+    el = _load_elements()
+    w = el.atomic_weight * el.percent / 100
+    iel = w.groupby(el.element).sum()
+    iel.name = 'atomic_weight'
+    return iel
+
 
+def save_periodic_table(table, path):
+    """
+    Save a nested periodic table dict (as returned by `periodic_table`) to .npz.
 
-def periodic_table():
+    The dict is flattened to one row per leaf value, with columns:
+        path : (n, depth) int16 codes into labels, -1 padded.
+        kind : int8, 0 for float, 1 for str and 2 for an empty dict.
+        num : float64 values (NaN unless kind is 0).
+        text : utf-8 bytes of the str value of each row, NUL separated.
+        labels, label_int : all dict keys as str, and True where
+            the key is an int.
+    """
+    labels = {}
+    rows = []
+
+    def walk(d, keys):
+        if not d:
+            rows.append((keys, _EMPTY, np.nan, ''))
+        for k, v in d.items():
+            if not isinstance(k, (str, int)):
+                raise ValueError(f'Unsupported key {k!r} at {keys}')
+            path = keys + [k]
+            if isinstance(v, dict):
+                walk(v, path)
+            elif isinstance(v, str):
+                if '\x00' in v:
+                    raise ValueError(f'NUL character in value at {path}')
+                rows.append((path, _STR, np.nan, v))
+            elif isinstance(v, (float, int)):
+                rows.append((path, _FLOAT, float(v), ''))
+            else:
+                raise ValueError(f'Unsupported value {v!r} at {path}')
+
+    walk(table, [])
+    depth = max(len(r[0]) for r in rows)
+    codes = np.full((len(rows), depth), -1, dtype=np.int16)
+    for i, (keys, *_) in enumerate(rows):
+        for j, k in enumerate(keys):
+            codes[i, j] = labels.setdefault(k, len(labels))
+
+    np.savez(path,
+             path=codes,
+             kind=np.array([r[1] for r in rows], dtype=np.int8),
+             num=np.array([r[2] for r in rows], dtype=np.float64),
+             text=np.frombuffer('\x00'.join(r[3] for r in rows).encode('utf-8'), dtype=np.uint8),
+             labels=np.array([str(k) for k in labels], dtype=str),
+             label_int=np.array([isinstance(k, int) for k in labels], dtype=bool))
+
+
+@functools.lru_cache()
+def _load_periodic_table(mmap_mode=None):
+    f = _resource('periodic_table.npz', mmap_mode)
+    labels = [int(k) if n else str(k) for k, n in zip(f['labels'].tolist(), f['label_int'].tolist())]
+    text = f['text'].tobytes().decode('utf-8').split('\x00')
+    values = [num if kind == _FLOAT else txt if kind == _STR else None
+              for kind, num, txt in zip(f['kind'].tolist(), f['num'].tolist(), text)]
+
+    # rows are grouped by parent dict, so look each parent up once
+    table = {}
+    parents = {}
+    for codes, v in zip(zip(*(c.tolist() for c in f['path'].T)), values):
+        codes = tuple(c for c in codes if c >= 0)
+        d = parents.get(codes[:-1])
+        if d is None:
+            d = table
+            for c in codes[:-1]:
+                d = d.setdefault(labels[c], {})
+            parents[codes[:-1]] = d
+        d[labels[codes[-1]]] = {} if v is None else v
+    return table
+
+
+def _copy(d):
+    return {k: _copy(v) if isinstance(v, dict) else v for k, v in d.items()}
+
+
+def periodic_table(mmap_mode=None):
     """
     Loads dict containing all elements and associated metadata.
 
     Scraped from https://www.webelements.com/
 
+    Parameters
+    ----------
+    mmap_mode : str
+        Passed to `load_npz`.
+
     Returns
     -------
     dict
     """
-    with open(os.path.dirname(__file__) + '/periodic_table/periodic_table.pkl', 'rb') as f:
-        return pickle.load(f)
+    return _copy(_load_periodic_table(mmap_mode))
 
 def decompose_molecule(molecule, n=1):
     """
@@ -56,31 +222,22 @@ def decompose_molecule(molecule, n=1):
     All elements in molecule with their associated counts : dict
     """
     if isinstance(n, str):
-        n = int(n)
-    
+        n = int(n) if n else 1
+
     # define regexs
-    parens = re.compile('\(([A-z0-9()]+)\)([0-9]+)?')
-    stoich = re.compile('([A-Z][a-z]?)([0-9]+)?')
+    parens = re.compile(r'\(([^()]*)\)([0-9]*)')  # innermost subgroups in parentheses
+    stoich = re.compile(r'([A-Z][a-z]?)([0-9]*)')
 
-    ps = parens.findall(molecule)  # find subgroups in parentheses
-    rem = parens.sub('', molecule)  # get remainder
-    
-    if len(ps) > 0:
-        for s, ns in ps:
-            comp = decompose_molecule(s, ns)
-        for k, v in comp.items():
-            comp[k] = v * n
-    else:
-        comp = {}
-        
-    for e, ns in stoich.findall(rem):
-        if e not in comp:
-            comp[e] = 0
-        if ns == '':
-            ns = 1 * n
-        else:
-            ns = int(ns) * n
-        comp[e] += ns
+    def expand(m):
+        return ''.join(f'{e}{c}' for e, c in decompose_molecule(m.group(1), m.group(2)).items())
+
+    # expand subgroups in parentheses, from the inside out
+    while parens.search(molecule):
+        molecule = parens.sub(expand, molecule)
+
+    comp = {}
+    for e, ns in stoich.findall(molecule):
+        comp[e] = comp.get(e, 0) + (int(ns) if ns else 1) * n
 
     return comp
 
@@ -109,6 +266,124 @@ def calc_M(molecule):
     
     return m
 
+def _merge_peaks(mass, prob, width):
+    """
+    Combine peaks whose masses fall in the same bin of size width,
+    at their probability-weighted mean mass.
+    """
+    bins = np.round(mass / width).astype(np.int64)
+    u, inv = np.unique(bins, return_inverse=True)
+    p = np.bincount(inv, weights=prob, minlength=u.size)
+    m = np.bincount(inv, weights=mass * prob, minlength=u.size) / p
+    return m, p
+
+
+def _convolve(a, b, threshold, width):
+    """
+    Pruned convolution of two (mass, probability) peak lists.
+    """
+    mass = (a[0][:, np.newaxis] + b[0]).ravel()
+    prob = (a[1][:, np.newaxis] * b[1]).ravel()
+    keep = prob >= threshold
+    return _merge_peaks(mass[keep], prob[keep], width)
+
+
+@functools.lru_cache()
+def _isotopes(element):
+    el = _load_elements()
+    el = el.loc[(el.element == element) & (el.percent > 0)]
+    if len(el) == 0:
+        raise ValueError(f'No natural isotope abundances for {element}.')
+    return el.atomic_weight.values, el.percent.values / el.percent.sum()
+
+
+@functools.lru_cache(maxsize=4096)
+def _element_pattern(element, n, threshold, width):
+    """
+    Isotope pattern of n atoms of an element, by repeated squaring.
+    """
+    base = _merge_peaks(*_isotopes(element), width)
+    out = (np.zeros(1), np.ones(1))
+    while n:
+        if n & 1:
+            out = _convolve(out, base, threshold, width)
+        n >>= 1
+        if n:
+            base = _convolve(base, base, threshold, width)
+    return out
+
+
+def _pattern(comp, threshold, width):
+    out = (np.zeros(1), np.ones(1))
+    for element, n in sorted(comp.items()):
+        out = _convolve(out, _element_pattern(element, n, threshold, width), threshold, width)
+    return out
+
+
+def isotope_pattern(molecule, threshold=1e-6, resolution=None):
+    """
+    Returns the isotopologue mass distribution of a molecule.
+
+    Isotope distributions of each element are combined by pruned polynomial
+    convolution: isotopologues with a probability below `threshold` are
+    discarded at every step, so the result is fast but slightly incomplete.
+    Patterns of each (element, count) are cached.
+
+    Parameters
+    ----------
+    molecule : str
+        A molecule in standard chemical notation,
+        e.g. 'CO2', 'HCO3' or 'B(OH)4'.
+    threshold : float
+        Minimum probability of an isotopologue.
+    resolution : float
+        Width of mass bins (Da) used to combine isotopologues. None keeps the
+        full isotopic fine structure (combining masses within 1e-6 Da). 1
+        gives the nominal mass pattern.
+
+    Returns
+    -------
+    pandas.DataFrame with columns (mass, abundance), sorted by mass. Abundances
+    are probabilities, and sum to slightly less than 1 due to pruning.
+    """
+    width = 1e-6 if resolution is None else float(resolution)
+    mass, prob = _pattern(decompose_molecule(molecule), float(threshold), width)
+    return pd.DataFrame({'mass': mass, 'abundance': prob})
+
+
+def isotope_patterns(molecules, threshold=1e-6, resolution=None):
+    """
+    Returns the isotopologue mass distributions of many molecules.
+
+    Element patterns are cached and shared between molecules, and
+    molecules with the same composition are only calculated once.
+
+    Parameters
+    ----------
+    molecules : list of str
+        Molecules in standard chemical notation.
+    threshold, resolution : float
+        See `isotope_pattern`.
+
+    Returns
+    -------
+    pandas.DataFrame with columns (molecule, mass, abundance).
+    """
+    width = 1e-6 if resolution is None else float(resolution)
+    molecules = list(molecules)
+    done = {}
+    patterns = []
+    for molecule in molecules:
+        key = frozenset(decompose_molecule(molecule).items())
+        if key not in done:
+            done[key] = _pattern(dict(key), float(threshold), width)
+        patterns.append(done[key])
+
+    sizes = [m.size for m, _ in patterns]
+    return pd.DataFrame({'molecule': np.repeat(np.array(molecules, dtype=object), sizes),
+                         'mass': np.concatenate([m for m, _ in patterns] or [np.empty(0)]),
+                         'abundance': np.concatenate([p for _, p in patterns] or [np.empty(0)])})
+
 # def seawater(Sal=35., unit='mol/kg'):
 #     """
 #     Standard mean composition of seawater.
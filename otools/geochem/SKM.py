@@ -3,7 +3,12 @@ DePaolo's (2011) Surface Kinetic Model
 """
 import numpy as np
 
-def calc_Rb_m2(Rp, Rb0=6e-7):
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+def calc_Rb_m2(Rp, Rb0=6e-7, Rp_ref=None):
     """
     Function for calculating Rb as a function of Rp.
 
@@ -13,25 +18,37 @@ def calc_Rb_m2(Rp, Rb0=6e-7):
     Parameters
     ----------
     Rp : array-like
-        Precipitation rate.
-    Rb0 : float
+        Precipitation rate. If more than 1D, the last axis holds
+        a series of Rp, and leading axes are independent batches.
+    Rb0 : float or array-like
         When Rp > Rb0, Rb = Rb0.
-        When Rp < Rb0, Rb = Rb0 - fn(Rp**0.5)
+        When Rp < Rb0, Rb = Rb0 * (Rp / Rp_ref)**0.5
+        If array-like, must broadcast against Rp.
+    Rp_ref : float or array-like
+        The reference Rp used to normalise Rp**0.5. Passing an explicit
+        value (e.g. Rp_ref=Rb0) makes the result for each Rp independent
+        of all other values, so data can be safely chunked.
+        If None, the maximum Rp < Rb0 along the last axis of Rp is used,
+        which reproduces the original implementation.
 
     Returns
     -------
     Rb : array-like
     """
-    Rb = np.full(Rp.shape, Rb0)
+    Rp = np.asarray(Rp, dtype=float)
+    Rb0 = np.asarray(Rb0, dtype=float)
     ind = Rp < Rb0
-    var = Rp[ind]**0.5
-    var /= var.max()
-    var *= Rb0
-    Rb[ind] = var
+
+    if Rp_ref is None:
+        # largest Rp below Rb0 in each series (0 for series with none)
+        Rp_ref = np.max(np.where(ind, Rp, 0), axis=-1, keepdims=True, initial=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Rb = np.where(ind, Rb0 * np.sqrt(Rp / Rp_ref), Rb0)
     return Rb
 
 
-def SKM(Rp, Kf, Keq, Rb=6e-7, mode=1):
+def SKM(Rp, Kf, Keq, Rb=6e-7, mode=1, Rp_ref=None):
     """
     DePaolo's (2011) Surface Kinetic Model
     
@@ -54,6 +71,9 @@ def SKM(Rp, Kf, Keq, Rb=6e-7, mode=1):
         2 = variable Rb, modified as a function of
             Rp**0.5 below Rb. Described in section
             4.1 of DePaolo (2011).
+    Rp_ref : float or array-like
+        Mode 2 only. Reference Rp used to normalise Rp**0.5.
+        See `calc_Rb_m2`.
 
     Returns
     -------
@@ -61,7 +81,7 @@ def SKM(Rp, Kf, Keq, Rb=6e-7, mode=1):
         Partitioning / fractionation of element in precipitated mineral.
     """
     if mode == 2:
-        Rb = calc_Rb_m2(Rp, Rb)
+        Rb = calc_Rb_m2(Rp, Rb, Rp_ref)
     return Kf / (1 + Rb * (Kf / Keq - 1) / (Rp + Rb))
 
 
@@ -83,3 +103,90 @@ def yKp_SKM(xKp, xKf, xKeq, yKf, yKeq):
     -------
     """
     return yKf / (1 + (xKf - xKp) * (yKf / yKeq - 1) / (xKp * (xKf / xKeq - 1)))
+
+
+
+def SKM_grid(Rp, Kf, Keq, Rb=6e-7, mode=1, Rp_ref=None, out=None, chunk_bytes=2**20, use_numexpr=True):
+    """
+    Evaluate the SKM over a full grid of Rp x Kf x Keq x Rb.
+
+    The grid is evaluated in chunks of roughly `chunk_bytes`, writing directly
+    into `out`, so no full-size temporaries are created. If `out` is a
+    memory-mapped array (or a filename), the grid never has to fit in RAM.
+
+    Parameters
+    ----------
+    Rp, Kf, Keq, Rb : array-like
+        1D axes of the grid. Scalars are treated as length-1 axes.
+    mode : int
+        Model mode, as in `SKM`. In mode 2, Rb is modified as a function
+        of the Rp axis separately for each value on the Rb axis.
+    Rp_ref : float
+        Mode 2 only. Reference Rp used to normalise Rp**0.5.
+        See `calc_Rb_m2`.
+    out : array-like or str
+        Array of shape (len(Rp), len(Kf), len(Keq), len(Rb)) to write results
+        into. If a str, a memory-mapped .npy file is created at that path.
+        If None, a new array is allocated.
+    chunk_bytes : int
+        Approximate size of each evaluated chunk.
+    use_numexpr : bool
+        If True and numexpr is installed, use it to evaluate each chunk.
+
+    Returns
+    -------
+    Kp : array-like
+        Of shape (len(Rp), len(Kf), len(Keq), len(Rb)).
+    """
+    Rp, Kf, Keq, Rb = (np.atleast_1d(np.asarray(a, dtype=float)) for a in (Rp, Kf, Keq, Rb))
+    shape = (Rp.size, Kf.size, Keq.size, Rb.size)
+
+    if out is None:
+        out = np.empty(shape)
+    elif isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=float, shape=shape)
+    elif out.shape != shape:
+        raise ValueError(f'out has shape {out.shape}, but grid has shape {shape}.')
+
+    # the small factors of the model are computed once for the whole grid:
+    # Kp = Kf / (1 + u * a), where u = Rb / (Rp + Rb) and a = Kf / Keq - 1
+    if mode == 2:
+        Rb_eff = calc_Rb_m2(Rp[np.newaxis, :], Rb[:, np.newaxis], Rp_ref).T
+    else:
+        Rb_eff = Rb[np.newaxis, :]
+    u = (Rb_eff / (Rp[:, np.newaxis] + Rb_eff))[:, np.newaxis, np.newaxis, :]  # (nRp, 1, 1, nRb)
+    a = (Kf[:, np.newaxis] / Keq[np.newaxis, :] - 1)[..., np.newaxis]  # (nKf, nKeq, 1)
+    Kf4 = Kf[:, np.newaxis, np.newaxis]  # (nKf, 1, 1)
+
+    # chunk over the Rp and Kf axes
+    row_bytes = Keq.size * Rb.size * out.itemsize
+    nKf = int(np.clip(chunk_bytes // row_bytes, 1, Kf.size))
+    nRp = int(np.clip(chunk_bytes // (row_bytes * nKf), 1, Rp.size))
+
+    use_numexpr = use_numexpr and ne is not None
+    buf = None
+    for i in range(0, Rp.size, nRp):
+        for j in range(0, Kf.size, nKf):
+            target = out[i:i + nRp, j:j + nKf]
+            ui = u[i:i + nRp]
+            aj = a[j:j + nKf]
+            Kfj = Kf4[j:j + nKf]
+            if use_numexpr:
+                ne.evaluate('Kfj / (1 + ui * aj)', out=target)
+                continue
+            if not target.flags.c_contiguous:
+                if buf is None or buf.shape != target.shape:
+                    buf = np.empty(target.shape)
+                chunk = buf
+            else:
+                chunk = target
+            np.multiply(ui, aj, out=chunk)
+            chunk += 1
+            np.divide(Kfj, chunk, out=chunk)
+            if chunk is not target:
+                target[...] = chunk
+
+    if isinstance(out, np.memmap):
+        out.flush()
+
+    return out
@@ -0,0 +1,175 @@
+"""
+Monte Carlo ensembles of calcification models on shared random draws.
+
+Input uncertainties are sampled in bulk, one chunk at a time, and every
+model is evaluated on the same draws. Only running summary statistics are
+kept between chunks, so memory use does not grow with ensemble size.
+"""
+import numbers
+
+import numpy as np
+import pandas as pd
+
+from ..bootstrap import resample
+from .calcification_models import TMT, Rayleigh_KD
+from .SKM import SKM
+
+# {name: (function, names of inputs passed as positional arguments)}
+default_models = {
+    'TMT': (TMT, ('Rsw', 'frac', 'x')),
+    'Rayleigh_KD': (Rayleigh_KD, ('f', 'alpha')),
+    'SKM': (SKM, ('Rp', 'Kf', 'Keq', 'Rb')),
+}
+
+
+class RunningStats:
+    """
+    Summary statistics of a stream of values, updated one chunk at a time.
+
+    Mean and standard deviation are exact (Chan et al's parallel update).
+    Quantiles are estimated from a histogram of fixed size, whose range is
+    set by the first chunk and padded by `pad` of its range on either side.
+    If later values fall outside this range, the bin width is doubled
+    (merging pairs of bins) and the range extended until they fit, so no
+    values are clipped.
+
+    Parameters
+    ----------
+    nbins : int
+        Number of histogram bins used to estimate quantiles. Rounded up to
+        an even number.
+    pad : float
+        Proportion of the first chunk's range to pad the histogram by.
+    """
+    def __init__(self, nbins=10000, pad=0.5):
+        self.nbins = nbins + nbins % 2
+        self.pad = pad
+        self.n = 0
+        self.mean = 0.
+        self.M2 = 0.
+        self.min = np.inf
+        self.max = -np.inf
+        self.edges = None
+        self.counts = np.zeros(self.nbins, dtype=np.int64)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float).ravel()
+        x = x[np.isfinite(x)]
+        n = x.size
+        if n == 0:
+            return
+
+        mean = x.mean()
+        M2 = np.sum((x - mean)**2)
+        delta = mean - self.mean
+        tot = self.n + n
+        self.mean += delta * n / tot
+        self.M2 += M2 + delta**2 * self.n * n / tot
+        self.n = tot
+        self.min = min(self.min, x.min())
+        self.max = max(self.max, x.max())
+
+        if self.edges is None:
+            lo, hi = x.min(), x.max()
+            rn = hi - lo if hi > lo else max(abs(lo), 1.)
+            self.edges = np.linspace(lo - self.pad * rn, hi + self.pad * rn, self.nbins + 1)
+        self._widen(x.min(), x.max())
+        i = np.searchsorted(self.edges, x, side='right') - 1
+        # values on the upper edge go in the last bin
+        self.counts += np.bincount(np.clip(i, 0, self.nbins - 1), minlength=self.nbins)
+
+    def _widen(self, lo, hi):
+        """
+        Double the bin width until the histogram covers [lo, hi].
+        """
+        half = self.nbins // 2
+        while lo < self.edges[0] or hi > self.edges[-1]:
+            merged = self.counts.reshape(half, 2).sum(1)
+            new = np.zeros(half, dtype=np.int64)
+            width = 2 * (self.edges[-1] - self.edges[0])
+            if lo < self.edges[0]:
+                self.counts = np.concatenate([new, merged])
+                self.edges = np.linspace(self.edges[-1] - width, self.edges[-1], self.nbins + 1)
+            else:
+                self.counts = np.concatenate([merged, new])
+                self.edges = np.linspace(self.edges[0], self.edges[0] + width, self.nbins + 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.M2 / (self.n - 1)) if self.n > 1 else np.nan
+
+    def quantile(self, q):
+        """
+        Estimate quantiles q (0-1) by interpolating the histogram CDF.
+        """
+        q = np.asarray(q, dtype=float)
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        cdf = np.concatenate([[0], np.cumsum(self.counts)]) / self.n
+        return np.clip(np.interp(q, cdf, self.edges), self.min, self.max)
+
+
+def _as_dist(v):
+    if isinstance(v, numbers.Real):
+        return None
+    if isinstance(v, tuple) or hasattr(v, 'rvs'):
+        return v
+    raise ValueError(f'Invalid input {v}. Must be a number, a (mean, std) tuple or a distribution with a .rvs() method.')
+
+
+def run_ensemble(inputs, N, models=None, chunksize=100000, quantiles=(0.025, 0.5, 0.975),
+                 random_state=None, nbins=10000):
+    """
+    Evaluate calcification models on a shared Monte Carlo ensemble of inputs.
+
+    Parameters
+    ----------
+    inputs : dict
+        {name: value} pairs describing each model input. Values may be numbers
+        (held constant), (mean, std) tuples, or distributions with a `.rvs()` method,
+        as in `otools.bootstrap.resample`. Names must match the input names of `models`.
+    N : int
+        Total number of ensemble members.
+    models : dict
+        {name: (function, input_names)}. Each function is called as
+        function(*[draws[n] for n in input_names]). If None, every model in
+        `default_models` whose inputs are all present in `inputs` is used.
+    chunksize : int
+        Number of ensemble members drawn and evaluated at a time.
+    quantiles : array-like
+        Quantiles (0-1) to report.
+    random_state : None, int or numpy.random.Generator
+        Seed for the random draws.
+    nbins : int
+        Number of histogram bins used to estimate quantiles. See `RunningStats`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by model name, with columns for the number of finite results,
+        mean, std, min, max, and each of the quantiles.
+    """
+    if models is None:
+        models = {k: v for k, v in default_models.items() if all(a in inputs for a in v[1])}
+    if len(models) == 0:
+        raise ValueError('No models to run. Check that input names match those of the models.')
+
+    rng = np.random.default_rng(random_state)
+    dists = {k: _as_dist(v) for k, v in inputs.items()}
+    sampled = [k for k, d in dists.items() if d is not None]
+    constants = {k: v for k, v in inputs.items() if dists[k] is None}
+
+    stats = {m: RunningStats(nbins=nbins) for m in models}
+    N = int(N)
+    for start in range(0, N, chunksize):
+        n = min(chunksize, N - start)
+        draws = dict(zip(sampled, resample(n, *(dists[k] for k in sampled), random_state=rng)))
+        draws.update(constants)
+        for m, (fn, args) in models.items():
+            stats[m].update(fn(*(draws[a] for a in args)))
+
+    out = pd.DataFrame({m: [s.n, s.mean, s.std, s.min, s.max, *s.quantile(quantiles)]
+                        for m, s in stats.items()},
+                       index=['n', 'mean', 'std', 'min', 'max'] + [f'{100 * q:g}%' for q in quantiles]).T
+    out['n'] = out['n'].astype(int)
+    return out
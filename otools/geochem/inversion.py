@@ -0,0 +1,167 @@
+"""
+Batched inversion of DePaolo's (2011) Surface Kinetic Model.
+
+Fits Kf, Keq and Rb to many Kp-Rp datasets at once with a
+Levenberg-Marquardt solver that uses the analytic Jacobian of the SKM.
+All datasets are updated together with stacked (ndatasets, 3, 3) solves,
+so there is no Python loop over datasets.
+"""
+import numpy as np
+
+from .SKM import SKM
+
+
+def SKM_jacobian(Rp, Kf, Keq, Rb):
+    """
+    Analytic partial derivatives of the SKM (mode 1) with respect to Kf, Keq and Rb.
+
+    Parameters
+    ----------
+    Rp, Kf, Keq, Rb : array-like
+        As in `SKM`. Must broadcast together.
+
+    Returns
+    -------
+    J : array-like
+        Of shape (*broadcast_shape, 3), containing dKp/dKf, dKp/dKeq, dKp/dRb.
+    """
+    # Kp = Kf / D, where D = 1 + u * (Kf / Keq - 1) and u = Rb / (Rp + Rb)
+    u = Rb / (Rp + Rb)
+    a = Kf / Keq - 1
+    D2 = (1 + u * a)**2
+
+    dKf = (1 - u) / D2
+    dKeq = Kf**2 * u / (Keq**2 * D2)
+    dRb = -Kf * a * Rp / ((Rp + Rb)**2 * D2)
+
+    return np.stack(np.broadcast_arrays(dKf, dKeq, dRb), -1)
+
+
+def _pad(a):
+    """
+    Stack a list of 1D arrays into a 2D array, padding with NaN.
+    """
+    if isinstance(a, np.ndarray):
+        return np.atleast_2d(a.astype(float))
+    a = [np.asarray(ai, dtype=float) for ai in a]
+    out = np.full((len(a), max(ai.size for ai in a)), np.nan)
+    for i, ai in enumerate(a):
+        out[i, :ai.size] = ai
+    return out
+
+
+def fit_SKM(Rp, Kp, sigma=None, p0=(1., 0.1, 6e-7), fit_Rb=True, maxiter=200, tol=1e-10):
+    """
+    Fit the SKM to many Kp-Rp datasets simultaneously.
+
+    Parameters
+    ----------
+    Rp : array-like
+        Precipitation rates. Either a 1D array shared by all datasets,
+        an array of shape (ndatasets, npoints), or a list of 1D arrays
+        (ragged datasets are padded with NaN).
+    Kp : array-like
+        Measured partition coefficients, in the same layout as Rp.
+        NaN values are ignored.
+    sigma : array-like
+        Standard deviations of Kp, in the same layout as Kp. If None, all
+        points are equally weighted and the covariance is scaled by the
+        reduced chi-squared of each fit (as in `scipy.optimize.curve_fit`).
+    p0 : array-like
+        Initial guess of (Kf, Keq, Rb), either of shape (3,) or (ndatasets, 3).
+    fit_Rb : bool
+        If False, Rb is held at its p0 value and only Kf and Keq are fitted.
+    maxiter : int
+        Maximum number of iterations.
+    tol : float
+        Relative change in chi-squared below which a fit is converged.
+
+    Returns
+    -------
+    p, cov, chi2, converged : tuple of arrays
+        p : (ndatasets, 3) best fit (Kf, Keq, Rb).
+        cov : (ndatasets, 3, 3) parameter covariance. Rows and columns of
+            parameters that were not fitted are zero.
+        chi2 : (ndatasets,) weighted sum of squared residuals.
+        converged : (ndatasets,) boolean.
+    """
+    Kp = _pad(Kp)
+    Rp = np.broadcast_to(_pad(Rp), Kp.shape)
+    if sigma is None:
+        w = np.ones(Kp.shape)
+        absolute_sigma = False
+    else:
+        w = 1 / np.broadcast_to(_pad(sigma), Kp.shape)**2
+        absolute_sigma = True
+
+    valid = np.isfinite(Kp) & np.isfinite(Rp) & np.isfinite(w)
+    w = np.where(valid, w, 0)
+    Kp = np.where(valid, Kp, 0)
+    Rp = np.where(valid, Rp, 1)
+
+    ndata = Kp.shape[0]
+    p = np.array(np.broadcast_to(np.asarray(p0, dtype=float), (ndata, 3)))
+    free = np.array([True, True, fit_Rb])
+    nfree = free.sum()
+
+    def residuals(p, sel):
+        pred = SKM(Rp[sel], *(p[:, i, np.newaxis] for i in range(3)))
+        return np.where(valid[sel], Kp[sel] - pred, 0)
+
+    def normal_eqs(p, sel):
+        J = SKM_jacobian(Rp[sel], *(p[:, i, np.newaxis] for i in range(3)))[..., free]
+        J = J * valid[sel, :, np.newaxis]
+        JtW = J.transpose(0, 2, 1) * w[sel, np.newaxis, :]
+        return JtW @ J, JtW
+
+    everything = slice(None)
+    r = residuals(p, everything)
+    chi2 = np.sum(w * r**2, -1)
+    lam = np.full(ndata, 1e-3)
+    converged = np.zeros(ndata, dtype=bool)
+    stopped = np.zeros(ndata, dtype=bool)
+    eye = np.eye(nfree)
+
+    for _ in range(maxiter):
+        idx = np.flatnonzero(~stopped)
+        if idx.size == 0:
+            break
+
+        JtWJ, JtW = normal_eqs(p[idx], idx)
+        g = np.einsum('nij,nj->ni', JtW, r[idx])
+        # Marquardt scaling makes the step independent of the (very different) parameter scales
+        diag = np.einsum('nii->ni', JtWJ)
+        A = JtWJ + lam[idx, np.newaxis, np.newaxis] * diag[:, np.newaxis, :] * eye
+        step = np.einsum('nij,nj->ni', np.linalg.pinv(A), g)
+
+        trial = p[idx].copy()
+        trial[:, free] += step
+        # keep parameters positive
+        trial = np.where(trial > 0, trial, p[idx] / 10)
+
+        r_trial = residuals(trial, idx)
+        chi2_trial = np.sum(w[idx] * r_trial**2, -1)
+        better = chi2_trial <= chi2[idx]
+        small = abs(chi2[idx] - chi2_trial) <= tol * chi2[idx]
+
+        accept = idx[better]
+        p[accept] = trial[better]
+        r[accept] = r_trial[better]
+        chi2[accept] = chi2_trial[better]
+        lam[accept] /= 10
+        lam[idx[~better]] *= 10
+
+        converged[idx[better & small]] = True
+        stopped[idx] = converged[idx] | (lam[idx] > 1e10)
+
+    # covariance
+    JtWJ, _ = normal_eqs(p, everything)
+    cov_free = np.linalg.pinv(JtWJ)
+    if not absolute_sigma:
+        dof = valid.sum(-1) - nfree
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov_free *= np.where(dof > 0, chi2 / dof, np.inf)[:, np.newaxis, np.newaxis]
+    cov = np.zeros((ndata, 3, 3))
+    cov[:, free[:, np.newaxis] & free[np.newaxis, :]] = cov_free.reshape(ndata, -1)
+
+    return p, cov, chi2, converged
@@ -0,0 +1,192 @@
+"""
+Variance-based (Sobol) global sensitivity analysis of geochemical models.
+
+Which uncertain input drives the variance of a model's output? For k
+inputs, quasi-random Saltelli sample matrices A, B and AB_i (A with column
+i taken from B) are drawn from a scrambled Sobol sequence, one chunk at a
+time, and the model is evaluated on all (k + 2) matrices of a chunk in a
+single vectorised call. First-order indices (S1) use the Saltelli et al
+(2010) estimator and total-order indices (ST) the Jansen (1999) estimator.
+
+Only per-block sums are kept between chunks, so memory does not grow with
+N, and bootstrap confidence intervals are calculated by resampling blocks.
+
+Example
+-------
+>>> sobol_indices('SKM', {'Rp': (1e-6, 2e-7), 'Kf': (0.03, 0.003),
+...                       'Keq': (0.01, 0.001), 'Rb': (6e-7, 1e-7)}, N=2**20)
+"""
+import numbers
+
+import numpy as np
+import pandas as pd
+
+from .ensemble import default_models
+
+
+def _ppf(dist):
+    """
+    Function mapping uniform (0, 1) draws to the distribution of an input.
+    """
+    from scipy.special import ndtri
+
+    if isinstance(dist, tuple):
+        mean, std = dist
+        return lambda u: mean + std * ndtri(u)
+    if hasattr(dist, 'ppf'):
+        return dist.ppf
+    raise ValueError(f'Invalid input {dist}. Must be a number, a (mean, std) tuple or a distribution with a .ppf() method.')
+
+
+def _pow2(n):
+    return 2**int(np.floor(np.log2(max(n, 1))))
+
+
+def saltelli_chunks(ppfs, N, chunksize=2**14, random_state=None):
+    """
+    Yield Saltelli sample matrices in chunks.
+
+    Parameters
+    ----------
+    ppfs : list
+        One function per input, mapping uniform draws to input values.
+    N : int
+        Number of base samples. Must be a multiple of chunksize, which
+        must be a power of 2, to keep the balance of the Sobol sequence.
+    chunksize : int
+    random_state : None, int or numpy.random.Generator
+        Seed for scrambling the sequence.
+
+    Yields
+    ------
+    numpy.ndarray of shape ((k + 2) * chunksize, k), stacking A, B, AB_1 ... AB_k.
+    """
+    from scipy.stats import qmc
+
+    k = len(ppfs)
+    sobol = qmc.Sobol(d=2 * k, scramble=True, seed=random_state)
+    eps = np.finfo(float).eps
+    for _ in range(N // chunksize):
+        u = np.clip(sobol.random(chunksize), eps, 1 - eps)
+        x = np.empty_like(u)
+        for i, ppf in enumerate(ppfs):
+            x[:, i] = ppf(u[:, i])
+            x[:, k + i] = ppf(u[:, k + i])
+        A, B = x[:, :k], x[:, k:]
+        out = np.tile(A, (k + 2, 1))
+        out[chunksize:2 * chunksize] = B
+        for i in range(k):
+            s = (i + 2) * chunksize
+            out[s:s + chunksize, i] = B[:, i]
+        yield out
+
+
+def _indices(sums, k):
+    """
+    S1 and ST from summed terms, along the last axis of sums.
+    """
+    n = sums[..., 0:1]
+    mean = (sums[..., 1:2] + sums[..., 2:3]) / (2 * n)
+    var = (sums[..., 3:4] + sums[..., 4:5]) / (2 * n) - mean**2
+    S1 = sums[..., 5:5 + k] / n / var
+    ST = 0.5 * sums[..., 5 + k:5 + 2 * k] / n / var
+    return S1, ST
+
+
+def sobol_indices(model, inputs, N=2**16, args=None, chunksize=2**14, nboot=1000, conf=0.95,
+                  nblocks=256, random_state=None):
+    """
+    First- and total-order Sobol indices of a vectorised model's inputs.
+
+    Parameters
+    ----------
+    model : str or function
+        A function whose inputs are passed as positional arrays, or the
+        name of a model in `otools.geochem.ensemble.default_models`
+        (e.g. 'SKM', 'TMT').
+    inputs : dict
+        {name: value}. Values may be numbers (held constant), (mean, std)
+        tuples (normally distributed), or distributions with a `.ppf()`
+        method, such as frozen `scipy.stats` distributions. Indices are
+        calculated for every input that is not constant.
+    N : int
+        Number of base samples. Rounded up to a multiple of chunksize.
+        The model is evaluated N * (k + 2) times, for k uncertain inputs.
+    args : list
+        Names of the inputs passed to model, in order. Defaults to those of
+        a named model, or the order of inputs.
+    chunksize : int
+        Base samples per chunk. Rounded down to a power of 2.
+    nboot : int
+        Number of bootstrap resamples for confidence intervals. 0 to skip.
+    conf : float
+        Confidence level of the intervals.
+    nblocks : int
+        Approximate number of blocks resampled by the bootstrap.
+    random_state : None, int or numpy.random.Generator
+        Seed for the Sobol scrambling and the bootstrap.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by input name, with columns S1 and ST, and their lower and
+        upper confidence limits. attrs holds the output mean and variance,
+        N, and the number of model evaluations and of rejected (non-finite)
+        samples.
+    """
+    if isinstance(model, str):
+        model, default_args = default_models[model]
+        args = args or default_args
+    args = list(args or inputs)
+    missing = [a for a in args if a not in inputs]
+    if missing:
+        raise ValueError(f'No values given for model inputs {missing}.')
+
+    sampled = [a for a in args if not isinstance(inputs[a], numbers.Real)]
+    k = len(sampled)
+    if k == 0:
+        raise ValueError('All inputs are constant, so there is nothing to analyse.')
+    ppfs = [_ppf(inputs[a]) for a in sampled]
+
+    rng = np.random.default_rng(random_state)
+    chunksize = _pow2(min(chunksize, N))
+    N = int(np.ceil(N / chunksize)) * chunksize
+    blocksize = min(chunksize, _pow2(N // nblocks))
+    col = {a: sampled.index(a) for a in sampled}
+
+    shift = None
+    blocks = []
+    rejected = 0
+    for X in saltelli_chunks(ppfs, N, chunksize, rng):
+        y = model(*(X[:, col[a]] if a in col else inputs[a] for a in args))
+        y = np.broadcast_to(np.asarray(y, dtype=float), (X.shape[0],)).reshape(k + 2, chunksize)
+        ok = np.all(np.isfinite(y), axis=0)
+        rejected += chunksize - ok.sum()
+        if shift is None:
+            # centre outputs on a rough mean, for numerical stability of the sums
+            shift = np.mean(y[0, ok]) if ok.any() else 0.
+        y = np.where(ok, y - shift, 0)
+        fA, fB, fAB = y[0], y[1], y[2:]
+        terms = np.vstack([ok, fA, fB, fA**2, fB**2, fB * (fAB - fA), (fA - fAB)**2])
+        blocks.append(terms.reshape(len(terms), -1, blocksize).sum(-1).T)
+    blocks = np.concatenate(blocks)
+
+    if blocks[:, 0].sum() < 2:
+        raise ValueError('Fewer than 2 samples gave finite model outputs.')
+    S1, ST = _indices(blocks.sum(0), k)
+    out = pd.DataFrame({'S1': S1, 'ST': ST}, index=pd.Index(sampled, name='input'))
+
+    if nboot:
+        idx = rng.integers(len(blocks), size=(nboot, len(blocks)))
+        bS1, bST = _indices(blocks[idx].sum(1), k)
+        lims = 100 * np.array([(1 - conf) / 2, (1 + conf) / 2])
+        out['S1_lo'], out['S1_hi'] = np.nanpercentile(bS1, lims, axis=0)
+        out['ST_lo'], out['ST_hi'] = np.nanpercentile(bST, lims, axis=0)
+        out = out[['S1', 'S1_lo', 'S1_hi', 'ST', 'ST_lo', 'ST_hi']]
+
+    n = blocks[:, 0].sum()
+    mean = (blocks[:, 1].sum() + blocks[:, 2].sum()) / (2 * n)
+    out.attrs.update(mean=mean + shift,
+                     var=(blocks[:, 3].sum() + blocks[:, 4].sum()) / (2 * n) - mean**2,
+                     N=N, evaluations=N * (k + 2), rejected=int(rejected))
+    return out
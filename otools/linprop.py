@@ -0,0 +1,337 @@
+"""
+Linear uncertainty propagation on numpy arrays.
+
+A `UArray` holds a float64 array of nominal values, plus the derivatives of
+each element with respect to a small number of independent uncertainty
+sources. Each source is itself an array of independent, unit-variance
+errors (e.g. the measurement errors of one input column), so derivatives
+are stored as arrays that broadcast against the nominal values, rather
+than as a dict per element like `uncertainties` does. Numpy ufuncs
+propagate through the nominal values and derivatives in vectorised form,
+at close to plain numpy speed.
+
+Only element-wise operations (ufuncs and indexing) are supported.
+Reductions such as `sum` or `mean` are not.
+
+Example
+-------
+>>> x = uarray([1., 2., 3.], [0.1, 0.1, 0.2])
+>>> std_devs(x * 2)
+array([0.2, 0.2, 0.4])
+>>> std_devs(x / x)
+array([0., 0., 0.])
+"""
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+
+class _Source:
+    """
+    An array of independent, unit-variance uncertainty sources.
+    """
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.size = int(np.prod(self.shape))
+
+    def index(self, shape):
+        """
+        Flat index of the source element each output element depends on,
+        for an output that the source broadcasts to.
+        """
+        return np.broadcast_to(np.arange(self.size).reshape(self.shape), shape)
+
+
+# derivatives of unary ufuncs, as functions of input (x) and result (r)
+_unary = {
+    np.negative: lambda x, r: -1,
+    np.positive: lambda x, r: 1,
+    np.absolute: lambda x, r: np.sign(x),
+    np.square: lambda x, r: 2 * x,
+    np.sqrt: lambda x, r: 0.5 / r,
+    np.cbrt: lambda x, r: 1 / (3 * r**2),
+    np.reciprocal: lambda x, r: -r**2,
+    np.exp: lambda x, r: r,
+    np.exp2: lambda x, r: r * np.log(2),
+    np.expm1: lambda x, r: r + 1,
+    np.log: lambda x, r: 1 / x,
+    np.log2: lambda x, r: 1 / (x * np.log(2)),
+    np.log10: lambda x, r: 1 / (x * np.log(10)),
+    np.log1p: lambda x, r: 1 / (1 + x),
+    np.sin: lambda x, r: np.cos(x),
+    np.cos: lambda x, r: -np.sin(x),
+    np.tan: lambda x, r: 1 + r**2,
+    np.arcsin: lambda x, r: 1 / np.sqrt(1 - x**2),
+    np.arccos: lambda x, r: -1 / np.sqrt(1 - x**2),
+    np.arctan: lambda x, r: 1 / (1 + x**2),
+    np.sinh: lambda x, r: np.cosh(x),
+    np.cosh: lambda x, r: np.sinh(x),
+    np.tanh: lambda x, r: 1 - r**2,
+}
+
+# partial derivatives of binary ufuncs, as functions of inputs (a, b) and result (r)
+_binary = {
+    np.add: (lambda a, b, r: 1, lambda a, b, r: 1),
+    np.subtract: (lambda a, b, r: 1, lambda a, b, r: -1),
+    np.multiply: (lambda a, b, r: b, lambda a, b, r: a),
+    np.true_divide: (lambda a, b, r: 1 / b, lambda a, b, r: -r / b),
+    np.power: (lambda a, b, r: b * a**(b - 1), lambda a, b, r: r * np.log(a)),
+    np.arctan2: (lambda a, b, r: b / (a**2 + b**2), lambda a, b, r: -a / (a**2 + b**2)),
+    np.hypot: (lambda a, b, r: a / r, lambda a, b, r: b / r),
+}
+
+# ufuncs that only act on nominal values (comparisons etc.)
+_nominal_only = {np.greater, np.greater_equal, np.less, np.less_equal, np.equal,
+                 np.not_equal, np.isfinite, np.isnan, np.isinf, np.sign, np.signbit}
+
+
+class UArray(NDArrayOperatorsMixin):
+    """
+    An array of values with linearly propagated uncertainties.
+
+    Usually created with `uarray` or `from_uncertainties`, rather than directly.
+
+    Parameters
+    ----------
+    nominal : array-like
+        Nominal values.
+    terms : list of (source, d, idx) tuples
+        d is the derivative of the values with respect to the (unit variance)
+        source, broadcastable to nominal.shape. idx is None if the source
+        broadcasts against the values element-wise, otherwise an integer
+        array of nominal.shape giving the flat index of the source element
+        each value depends on.
+    """
+    def __init__(self, nominal, terms=()):
+        self.nominal = np.asarray(nominal, dtype=float)
+        self.terms = list(terms)
+
+    # array-like attributes
+    @property
+    def shape(self):
+        return self.nominal.shape
+
+    @property
+    def ndim(self):
+        return self.nominal.ndim
+
+    @property
+    def size(self):
+        return self.nominal.size
+
+    def __len__(self):
+        return len(self.nominal)
+
+    def __repr__(self):
+        return f'UArray(nominal={self.nominal!r},\n       std={self.std!r})'
+
+    @property
+    def std(self):
+        """
+        Standard deviations of the values.
+        """
+        return np.sqrt(self.var)
+
+    @property
+    def var(self):
+        """
+        Variances of the values.
+        """
+        var = np.zeros(self.shape)
+        by_source = {}
+        for src, d, idx in self.terms:
+            by_source.setdefault(id(src), []).append((src, d, idx))
+        for terms in by_source.values():
+            for i, (src, d, idx) in enumerate(terms):
+                var += d**2
+                for src, d2, idx2 in terms[i + 1:]:
+                    # two terms only covary where they refer to the same source element
+                    same = self._index(src, idx) == self._index(src, idx2)
+                    var += 2 * np.where(same, d * d2, 0)
+        return var
+
+    def _index(self, src, idx):
+        return src.index(self.shape) if idx is None else idx
+
+    def covariance(self):
+        """
+        The full covariance matrix between all (flattened) values.
+
+        Of shape (size, size), so only suitable for small arrays.
+        """
+        J = self.jacobian()
+        return J @ J.T
+
+    def jacobian(self):
+        """
+        Dense Jacobian of the (flattened) values with respect to all
+        unit-variance sources, of shape (size, total source size).
+        """
+        sources = {}
+        for src, _, _ in self.terms:
+            sources.setdefault(id(src), src)
+        offsets = dict(zip(sources, np.cumsum([0] + [s.size for s in sources.values()])))
+        ncol = sum(s.size for s in sources.values())
+
+        J = np.zeros((self.size, ncol))
+        rows = np.arange(self.size)
+        for src, d, idx in self.terms:
+            cols = offsets[id(src)] + self._index(src, idx).ravel()
+            np.add.at(J, (rows, cols), np.broadcast_to(d, self.shape).ravel())
+        return J
+
+    def __getitem__(self, key):
+        nominal = self.nominal[key]
+        terms = [(src, np.broadcast_to(d, self.shape)[key], self._index(src, idx)[key])
+                 for src, d, idx in self.terms]
+        return UArray(nominal, terms)
+
+    def __array__(self, dtype=None, copy=None):
+        raise TypeError('UArray cannot be converted to a plain array. Use nominal_values() or std_devs().')
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or 'out' in kwargs:
+            return NotImplemented
+
+        nominals = [i.nominal if isinstance(i, UArray) else np.asarray(i) for i in inputs]
+        if ufunc in _nominal_only:
+            return ufunc(*nominals, **kwargs)
+
+        if ufunc in _unary:
+            partials = (_unary[ufunc],)
+        elif ufunc in _binary:
+            partials = _binary[ufunc]
+        else:
+            return NotImplemented
+
+        r = ufunc(*nominals, **kwargs)
+        terms = []
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for inp, partial in zip(inputs, partials):
+                if not isinstance(inp, UArray) or len(inp.terms) == 0:
+                    continue
+                dfdx = partial(*nominals, r)
+                for src, d, idx in inp.terms:
+                    if idx is not None and idx.shape != r.shape:
+                        # broadcast up, so indexing and the Jacobian see the result's shape
+                        terms.append((src, np.broadcast_to(d * dfdx, r.shape), np.broadcast_to(idx, r.shape)))
+                    else:
+                        terms.append((src, d * dfdx, idx))
+        return UArray(r, _merge(terms))
+
+
+def _merge(terms):
+    """
+    Sum derivative terms that refer to the same source elements.
+    """
+    merged = {}
+    for src, d, idx in terms:
+        key = (id(src), id(idx))
+        if key in merged:
+            merged[key] = (src, merged[key][1] + d, idx)
+        else:
+            merged[key] = (src, d, idx)
+    return list(merged.values())
+
+
+def uarray(nominal, std):
+    """
+    Create a UArray of independent values.
+
+    Parameters
+    ----------
+    nominal, std : array-like
+        Nominal values and their standard deviations.
+
+    Returns
+    -------
+    UArray
+    """
+    nominal = np.asarray(nominal, dtype=float)
+    std = np.broadcast_to(np.asarray(std, dtype=float), nominal.shape)
+    return UArray(nominal, [(_Source(nominal.shape), std, None)])
+
+
+def nominal_values(a):
+    """
+    Nominal values of a UArray (or a plain array).
+    """
+    return a.nominal if isinstance(a, UArray) else np.asarray(a)
+
+
+def std_devs(a):
+    """
+    Standard deviations of a UArray (zeros for a plain array).
+    """
+    return a.std if isinstance(a, UArray) else np.zeros(np.shape(a))
+
+
+def from_uncertainties(a):
+    """
+    Convert an array of `uncertainties` objects to a UArray, keeping correlations.
+
+    If every element depends on a different single Variable (e.g. the output
+    of `uncertainties.unumpy.uarray`), the result has a single element-wise
+    source. Otherwise each underlying Variable becomes its own scalar source,
+    which is exact but stores one derivative array per Variable.
+
+    Parameters
+    ----------
+    a : array-like
+        Of uncertainties objects and/or floats.
+
+    Returns
+    -------
+    UArray
+    """
+    import uncertainties as un
+
+    a = np.asarray(a, dtype=object)
+    flat = a.ravel()
+    nominal = np.array([v.nominal_value if isinstance(v, un.core.AffineScalarFunc) else v
+                        for v in flat], dtype=float).reshape(a.shape)
+    derivs = [v.derivatives if isinstance(v, un.core.AffineScalarFunc) else {} for v in flat]
+
+    variables = {}
+    for i, d in enumerate(derivs):
+        for var in d:
+            variables.setdefault(var, []).append(i)
+
+    if all(len(d) <= 1 for d in derivs) and all(len(i) == 1 for i in variables.values()):
+        std = np.zeros(flat.size)
+        for i, d in enumerate(derivs):
+            for var, dv in d.items():
+                std[i] = dv * var.std_dev
+        return UArray(nominal, [(_Source(a.shape), std.reshape(a.shape), None)])
+
+    terms = []
+    for var, idx in variables.items():
+        d = np.zeros(flat.size)
+        d[idx] = [derivs[i][var] * var.std_dev for i in idx]
+        terms.append((_Source(()), d.reshape(a.shape), None))
+    return UArray(nominal, terms)
+
+
+def to_uncertainties(a):
+    """
+    Convert a UArray to an array of `uncertainties` objects, keeping correlations.
+
+    Each source element becomes an `uncertainties` Variable with a nominal
+    value of 0 and a standard deviation of 1.
+
+    Parameters
+    ----------
+    a : UArray
+
+    Returns
+    -------
+    numpy.ndarray of uncertainties objects
+    """
+    import uncertainties.unumpy as unp
+
+    out = a.nominal.astype(object)
+    variables = {}
+    for src, d, idx in a.terms:
+        if id(src) not in variables:
+            variables[id(src)] = unp.uarray(np.zeros(src.size), np.ones(src.size))
+        out = out + np.broadcast_to(d, a.shape) * variables[id(src)][a._index(src, idx)]
+    return out
@@ -0,0 +1,204 @@
+"""
+Run many independent MCMC fits of the same model across a process pool.
+
+All datasets are packed into one shared memory block, which worker
+processes attach to once, so data is not pickled per fit. Each worker
+runs a whole `mcmc_fn` fit and returns only a small summary (parameter
+quantiles, acceptance fraction and autocorrelation time), so memory
+stays bounded however many fits are run. A fit that raises is recorded
+as failed, without stopping the others.
+
+Example
+-------
+>>> datasets = [(x, obs, sigma) for x, obs, sigma in specimens]
+>>> out = mcmc_batch(datasets, my_loglik, p0=[1, 0], niter=2000)
+>>> out.loc[out.error.isna(), ['p0_50%', 'p0_tau', 'acceptance']]
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import warnings
+import numpy as np
+import pandas as pd
+
+_worker = {}
+
+
+def pack_datasets(datasets):
+    """
+    Copy (x, obs, sigma) datasets into one shared memory block.
+
+    Returns
+    -------
+    (shm, layout) : the `SharedMemory` block, which the caller must close
+        and unlink, and a list of ((offset, shape), ...) for each dataset,
+        in units of float64 items.
+    """
+    arrays = [[np.asarray(a, dtype=float) for a in d] for d in datasets]
+    size = sum(a.size for d in arrays for a in d)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1) * 8)
+    buf = np.ndarray((size,), dtype=float, buffer=shm.buf)
+    layout = []
+    offset = 0
+    for d in arrays:
+        entry = []
+        for a in d:
+            buf[offset:offset + a.size] = a.ravel()
+            entry.append((offset, a.shape))
+            offset += a.size
+        layout.append(tuple(entry))
+    return shm, layout
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python < 3.13 has no track
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(name, layout, loglik, p0, settings, shm=None):
+    if shm is None:
+        shm = _attach(name)
+    logging.getLogger('emcee').setLevel(logging.ERROR)
+    _worker.update(shm=shm, layout=layout, loglik=loglik, p0=p0, settings=settings,
+                   data=np.ndarray((shm.size // 8,), dtype=float, buffer=shm.buf))
+
+
+def _dataset(i):
+    data = _worker['data']
+    return tuple(data[o:o + int(np.prod(shape))].reshape(shape) for o, shape in _worker['layout'][i])
+
+
+def _fit(i, seed):
+    """
+    Fit dataset i in a worker. Returns (i, summary, error).
+    """
+    from .likelihood import mcmc_fn
+
+    s = _worker['settings']
+    try:
+        x, obs, sigma = _dataset(i)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            sampler = mcmc_fn(x, obs, _worker['loglik'], _worker['p0'], sigma,
+                              nwalkers=s['nwalkers'], niter=s['niter'], start_sd=s['start_sd'],
+                              bounds=s['bounds'], nstarts=s['nstarts'], nproc=1, progress=False,
+                              random_state=np.random.default_rng(seed))
+            chain = sampler.get_chain(discard=s['burnin'], flat=True)
+            tau = sampler.get_autocorr_time(discard=s['burnin'], quiet=True)
+        return i, {'quantiles': np.quantile(chain, s['quantiles'], axis=0).T,
+                   'tau': tau,
+                   'acceptance': np.mean(sampler.acceptance_fraction),
+                   'max_logprob': np.max(sampler.get_log_prob(discard=s['burnin']))}, None
+    except Exception as e:
+        return i, None, f'{type(e).__name__}: {e}'
+
+
+def mcmc_batch(datasets, loglik, p0, nwalkers=32, niter=5000, burnin=None, start_sd=1e-2,
+               bounds=None, nstarts=64, quantiles=(0.025, 0.16, 0.5, 0.84, 0.975), names=None,
+               nproc=None, progress=True, random_state=None):
+    """
+    Fit the same model to many datasets, one `mcmc_fn` fit per dataset.
+
+    Parameters
+    ----------
+    datasets : list
+        Of (x, obs, sigma) for each fit. sigma may be a scalar.
+    loglik : function
+        Of form f(p, x, obs, sigma), which returns the log likelihood.
+        Must be defined at module level to run across processes.
+    p0 : array-like
+        Initial guess parameters, shared by all fits.
+    nwalkers, niter, start_sd, bounds, nstarts
+        Passed to `mcmc_fn`. Multistart searches (if bounds are given)
+        run serially inside each worker.
+    burnin : int
+        Iterations discarded from the start of each chain. Defaults to niter // 2.
+    quantiles : array-like
+        Quantiles of each parameter to report.
+    names : list
+        Parameter names, used for column labels. Defaults to p0, p1, ...
+    nproc : int
+        Number of processes. If 1, or loglik cannot be pickled, runs serially.
+    progress : bool
+        Show one progress bar of completed fits.
+    random_state : None or int
+        Seed for reproducible fits, including multistart searches if bounds
+        are given. Each fit gets its own Generator, passed to `mcmc_fn`, so
+        results do not depend on nproc or the order fits complete in.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per dataset, with columns '{name}_{q}%' and '{name}_tau'
+        for each parameter, 'acceptance' (mean acceptance fraction),
+        'max_logprob' and 'error' (None, or the exception of a failed fit,
+        whose other columns are NaN).
+    """
+    from tqdm import tqdm
+    from .multistart import _picklable
+
+    ndim = len(p0)
+    names = names or [f'p{i}' for i in range(ndim)]
+    quantiles = np.atleast_1d(quantiles)
+    settings = dict(nwalkers=nwalkers, niter=niter, start_sd=start_sd, bounds=bounds,
+                    nstarts=nstarts, quantiles=quantiles,
+                    burnin=niter // 2 if burnin is None else burnin)
+    seeds = [s.generate_state(4) for s in np.random.SeedSequence(random_state).spawn(len(datasets))]
+
+    if nproc != 1 and not _picklable(loglik):
+        warnings.warn('loglik cannot be pickled, so mcmc_batch is running serially. '
+                      'Define loglik at module level to run in parallel.')
+        nproc = 1
+
+    qs = np.full((len(datasets), ndim, len(quantiles)), np.nan)
+    tau = np.full((len(datasets), ndim), np.nan)
+    acceptance = np.full(len(datasets), np.nan)
+    max_logprob = np.full(len(datasets), np.nan)
+    errors = [None] * len(datasets)
+
+    def collect(i, summary, error):
+        if error is not None:
+            errors[i] = error
+            return True
+        qs[i] = summary['quantiles']
+        tau[i] = summary['tau']
+        acceptance[i] = summary['acceptance']
+        max_logprob[i] = summary['max_logprob']
+        return False
+
+    shm, layout = pack_datasets(datasets)
+    failed = 0
+    try:
+        with tqdm(total=len(datasets), desc='Fits', disable=not progress) as bar:
+            if nproc == 1:
+                _init_worker(shm.name, layout, loglik, p0, settings, shm=shm)
+                try:
+                    for i in range(len(datasets)):
+                        failed += collect(*_fit(i, seeds[i]))
+                        bar.update()
+                        bar.set_postfix(failed=failed, refresh=False)
+                finally:
+                    _worker.clear()
+            else:
+                with ProcessPoolExecutor(nproc, initializer=_init_worker,
+                                         initargs=(shm.name, layout, loglik, p0, settings)) as pool:
+                    futures = [pool.submit(_fit, i, seeds[i]) for i in range(len(datasets))]
+                    for future in as_completed(futures):
+                        failed += collect(*future.result())
+                        bar.update()
+                        bar.set_postfix(failed=failed, refresh=False)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    out = {}
+    for j, name in enumerate(names):
+        for k, q in enumerate(quantiles):
+            out[f'{name}_{100 * q:g}%'] = qs[:, j, k]
+        out[f'{name}_tau'] = tau[:, j]
+    out['acceptance'] = acceptance
+    out['max_logprob'] = max_logprob
+    out['error'] = errors
+    return pd.DataFrame(out, index=pd.RangeIndex(len(datasets), name='fit'))
@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from corner import corner
 
 def flatten_chain(sampler, burnin=500, tailtrim=-1, acceptance_threshold=0.23):
     """
@@ -13,6 +11,8 @@ def plot_walkers(sampler, burnin=500, acceptance_threshold=0.23, labels=None):
     """
     Plot all walkers from sampler.
     """
+    import matplotlib.pyplot as plt
+
     print('{:} chains below acceptance threshold ({:.2f})'.format(sum(sampler.acceptance_fraction <= acceptance_threshold),
                                                                   acceptance_threshold))
 
@@ -69,17 +69,125 @@ def plot_walkers(sampler, burnin=500, acceptance_threshold=0.23, labels=None):
 
     return fig, axs
 
-def plot_corner(sampler, burnin=500, acceptance_threshold=0.23, bins=20, truths=None, labels=None, **kwargs):
+def plot_corner(sampler, burnin=500, acceptance_threshold=0.23, bins=20, truths=None, labels=None,
+                kde=False, **kwargs):
+    """
+    Corner plot of the flattened chains.
 
+    If kde is True, densities are drawn with `corner_kde` (binned FFT KDEs
+    and HPD contours), which is much faster than `corner` for long chains,
+    and kwargs are passed to it. Otherwise they are passed to `corner.corner`.
+    """
     flatchain = flatten_chain(sampler, burnin=burnin, acceptance_threshold=acceptance_threshold)
     
     if labels is None:
-        labels = ['p{:.0f}'.format(i) for i in range(len(flatchain))]
+        labels = ['p{:.0f}'.format(i) for i in range(flatchain.shape[1])]
+
+    if kde:
+        return corner_kde(flatchain, labels=labels, truths=truths, **kwargs)
+
+    from corner import corner
 
     fig = corner(flatchain, labels=labels, bins=bins, truths=truths, truth_color='r', **kwargs)
     
     return fig, fig.axes
 
+def corner_kde(flatchain, labels=None, truths=None, masses=(0.68, 0.95), ngrid=128, bw='scott',
+               color='k', figsize=None):
+    """
+    Corner plot of kernel density estimates.
+
+    Diagonal panels show the 1D density of each parameter, with its
+    largest HPD interval shaded. Lower panels show 2D densities, with
+    contours enclosing each of masses.
+
+    Parameters
+    ----------
+    flatchain : array-like
+        Samples, of shape (n, ndim).
+    labels : list
+        Parameter names.
+    truths : array-like
+        Values marked in red.
+    masses : tuple
+        Probability masses of the HPD contours.
+    ngrid : int
+        Grid points per dimension of the 2D densities (1D densities use 4x more).
+    bw : str or float
+        Passed to `otools.mcmc.density.kde1d` and `kde2d`.
+    color : str
+    figsize : tuple
+
+    Returns
+    -------
+    (fig, axs)
+    """
+    import matplotlib.pyplot as plt
+    from .density import kde1d, kde2d, hpd_interval, hpd_levels
+
+    flatchain = np.asarray(flatchain)
+    ndim = flatchain.shape[1]
+    if labels is None:
+        labels = ['p{:.0f}'.format(i) for i in range(ndim)]
+    masses = sorted(np.atleast_1d(masses))
+    
+    fig, axs = plt.subplots(ndim, ndim, figsize=figsize or (2 * ndim, 2 * ndim), squeeze=False)
+    lims = []
+    for i in range(ndim):
+        ax = axs[i, i]
+        grid, dens = kde1d(flatchain[:, i], ngrid=4 * ngrid, bw=bw)
+        ax.plot(grid, dens, c=color)
+        for lo, hi in hpd_interval(grid, dens, masses[-1]):
+            sel = (grid >= lo) & (grid <= hi)
+            ax.fill_between(grid[sel], dens[sel], color=color, alpha=0.2, lw=0)
+        ax.set_yticks([])
+        ax.set_ylim(0, None)
+        lims.append((grid[0], grid[-1]))
+
+    for i in range(ndim):
+        for j in range(ndim):
+            ax = axs[i, j]
+            if j > i:
+                ax.set_visible(False)
+                continue
+            if j < i:
+                gx, gy, dens = kde2d(flatchain[:, j], flatchain[:, i], ngrid=ngrid, bw=bw,
+                                     lims=(lims[j], lims[i]))
+                levels = hpd_levels(dens, masses[::-1])
+                ax.contourf(gx, gy, dens, levels=np.append(levels, 1.001 * dens.max()), colors=color, alpha=0.15)
+                ax.contour(gx, gy, dens, levels=levels, colors=color, linewidths=0.8)
+                ax.set_ylim(lims[i])
+                if truths is not None:
+                    ax.axhline(truths[i], c='r')
+            if truths is not None:
+                ax.axvline(truths[j], c='r')
+            ax.set_xlim(lims[j])
+            if i < ndim - 1:
+                ax.set_xticklabels([])
+            else:
+                ax.set_xlabel(labels[j])
+            if j > 0 and j < i:
+                ax.set_yticklabels([])
+            elif j == 0 and i > 0:
+                ax.set_ylabel(labels[i])
+    
+    fig.tight_layout()
+    return fig, axs
+
 def percentiles(sampler, percentiles=(2.5, 50, 97.5), burnin=500, acceptance_threshold=0.23):
     flatchain = flatten_chain(sampler, burnin=burnin, acceptance_threshold=acceptance_threshold)
-    return np.percentile(flatchain, percentiles, 0).T
\ No newline at end of file
+    return np.percentile(flatchain, percentiles, 0).T
+
+def hpd_intervals(sampler, mass=0.95, burnin=500, acceptance_threshold=0.23, ngrid=512, bw='scott'):
+    """
+    Highest posterior density interval of each parameter, from binned KDEs.
+
+    Returns
+    -------
+    list of numpy.ndarray, one per parameter, of (lower, upper) bounds.
+    Multimodal parameters can have more than one interval.
+    """
+    from .density import kde1d, hpd_interval
+
+    flatchain = flatten_chain(sampler, burnin=burnin, acceptance_threshold=acceptance_threshold)
+    return [hpd_interval(*kde1d(p, ngrid=ngrid, bw=bw), mass) for p in flatchain.T]
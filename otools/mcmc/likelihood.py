@@ -1,7 +1,6 @@
 import numpy as np
-import scipy.optimize as opt
-import emcee
-from tqdm import tqdm
+
+from ..profiling import instrument, span
 
 def log_likelihood(pred, obs, obs_err):
     return -0.5 * np.nansum((obs - pred)**2 / obs_err**2 + np.log(obs_err**2))
@@ -34,7 +33,34 @@ def poly_log_likelihood(p, x, obs, sigma=1):
     pred = np.polyval(p, x)
     return log_likelihood(pred, obs, sigma)
 
-def mcmc_poly(x, obs, sigma=1, order=1, nwalkers=32, niter=5000, start_sd=1e-2):
+def _initial_walkers(loglik, x, obs, sigma, p0, nwalkers, start_sd, bounds=None, nstarts=64, nproc=None,
+                     random_state=None):
+    """
+    Starting positions of walkers: from a multistart search if bounds are
+    given, otherwise scattered around a single minimisation from p0.
+
+    random_state is a numpy.random.Generator, or None to use numpy's global
+    random state (and unseeded multistart draws).
+    """
+    import scipy.optimize as opt
+    from .multistart import NegLogLik, multistart, walker_starts
+
+    if bounds is not None:
+        with span('multistart'):
+            res = multistart(loglik, x, obs, sigma, bounds=bounds, nstarts=nstarts, nproc=nproc,
+                             random_state=random_state)
+        return walker_starts(res.x, res.cov, nwalkers, bounds=bounds, random_state=random_state)
+
+    with span('minimize'):
+        fmin = opt.minimize(NegLogLik(loglik, x, obs, sigma), p0)
+    # multiplicative scatter, or additive for parameters at zero
+    rng = np.random if random_state is None else random_state
+    scatter = rng.normal(0, start_sd, (nwalkers, len(fmin.x)))
+    return fmin.x + scatter * np.where(fmin.x != 0, np.abs(fmin.x), 1)
+
+@instrument('mcmc.mcmc_poly')
+def mcmc_poly(x, obs, sigma=1, order=1, nwalkers=32, niter=5000, start_sd=1e-2,
+              bounds=None, nstarts=64, nproc=None, progress=True, random_state=None):
     """
     Run an MCMC sampler for a simple polynomial.
 
@@ -56,26 +82,49 @@ def mcmc_poly(x, obs, sigma=1, order=1, nwalkers=32, niter=5000, start_sd=1e-2):
         The spread in the initial conditions. Function minimum us multiplied
         by normally distributed random numbers with a mean of 1, and a
         standard deviation of start_sd.
+    bounds : array-like
+        Optional (min, max) of each parameter. If given, the likelihood is
+        -inf outside the bounds, and walkers start from the best basin of
+        a multistart search (see `otools.mcmc.multistart`) instead of p0.
+    nstarts : int
+        The number of local optimisations in the multistart search.
+    nproc : int
+        Number of processes for the multistart search.
+    progress : bool
+        Show a progress bar while sampling.
+    random_state : None, int or numpy.random.Generator
+        Seed for the walkers' starting positions and the sampler. If None,
+        numpy's global random state is used.
 
     Returns
     -------
     emcee.ensemble.EnsembleSampler : MCMC sampler object
     """
+    import emcee
+    from tqdm import tqdm
+    from .multistart import BoundedLogLik
+
     p0 = [0] * order
     
-    negloglik = lambda p, x, obs, sigma: -poly_log_likelihood(p, x, obs, sigma)
-    
-    fmin = opt.minimize(negloglik, p0, args=(x, obs, sigma))
-    start = np.random.normal(1, start_sd, (nwalkers, 1)) * fmin.x
+    rng = None if random_state is None else np.random.default_rng(random_state)
+    start = _initial_walkers(poly_log_likelihood, x, obs, sigma, p0, nwalkers, start_sd,
+                             bounds, nstarts, nproc, rng)
+    loglik = poly_log_likelihood if bounds is None else BoundedLogLik(poly_log_likelihood, bounds)
     
-    sampler = emcee.EnsembleSampler(nwalkers, order, poly_log_likelihood, args=(x, obs, sigma))
+    sampler = emcee.EnsembleSampler(nwalkers, order, loglik, args=(x, obs, sigma))
+    if rng is not None:
+        sampler.random_state = np.random.RandomState(rng.integers(2**32)).get_state()
     
-    for i in tqdm(sampler.sample(p0=start, iterations=niter), total=niter, desc='Sampling'):
-        pass
+    with span('sample', nwalkers=nwalkers, niter=niter):
+        for i in tqdm(sampler.sample(start, iterations=niter), total=niter, desc='Sampling',
+                      disable=not progress):
+            pass
     
     return sampler
 
-def mcmc_fn(x, obs, loglik, p0, sigma=1, nwalkers=32, niter=5000, start_sd=1e-2):
+@instrument('mcmc.mcmc_fn')
+def mcmc_fn(x, obs, loglik, p0, sigma=1, nwalkers=32, niter=5000, start_sd=1e-2,
+            bounds=None, nstarts=64, nproc=None, progress=True, random_state=None):
     """
     Run an MCMC sampler for a simple polynomial.
 
@@ -99,22 +148,44 @@ def mcmc_fn(x, obs, loglik, p0, sigma=1, nwalkers=32, niter=5000, start_sd=1e-2)
         The spread in the initial conditions. Function minimum us multiplied
         by normally distributed random numbers with a mean of 1, and a
         standard deviation of start_sd.
+    bounds : array-like
+        Optional (min, max) of each parameter. If given, the likelihood is
+        -inf outside the bounds, and walkers start from the best basin of
+        a multistart search (see `otools.mcmc.multistart`) instead of p0.
+    nstarts : int
+        The number of local optimisations in the multistart search.
+    nproc : int
+        Number of processes for the multistart search.
+    progress : bool
+        Show a progress bar while sampling.
+    random_state : None, int or numpy.random.Generator
+        Seed for the walkers' starting positions and the sampler. If None,
+        numpy's global random state is used.
 
     Returns
     -------
     emcee.ensemble.EnsembleSampler : MCMC sampler object
     """
+    import emcee
+    from tqdm import tqdm
+    from .multistart import BoundedLogLik
+
     ndim = len(p0)
     
-    negloglik = lambda p, x, obs, sigma: -loglik(p, x, obs, sigma)
-    
-    fmin = opt.minimize(negloglik, p0, args=(x, obs, sigma))
-    start = np.random.normal(1, start_sd, (nwalkers, 1)) * fmin.x
+    rng = None if random_state is None else np.random.default_rng(random_state)
+    start = _initial_walkers(loglik, x, obs, sigma, p0, nwalkers, start_sd,
+                             bounds, nstarts, nproc, rng)
+    if bounds is not None:
+        loglik = BoundedLogLik(loglik, bounds)
     
     sampler = emcee.EnsembleSampler(nwalkers, ndim, loglik, args=(x, obs, sigma))
+    if rng is not None:
+        sampler.random_state = np.random.RandomState(rng.integers(2**32)).get_state()
     
-    for i in tqdm(sampler.sample(p0=start, iterations=niter), total=niter, desc='Sampling'):
-        pass
+    with span('sample', nwalkers=nwalkers, niter=niter):
+        for i in tqdm(sampler.sample(start, iterations=niter), total=niter, desc='Sampling',
+                      disable=not progress):
+            pass
     
     return sampler
 
@@ -0,0 +1,262 @@
+"""
+Multi-start optimisation, for finding MCMC starting points on multimodal likelihoods.
+
+Many local optimisations are run from Latin hypercube starting points
+within parameter bounds, across a process pool. Their optima are
+clustered into basins, and walkers are seeded from the best basin's
+local (inverse Hessian) covariance.
+
+Example
+-------
+>>> res = multistart(loglik, x, obs, sigma, bounds=[(0, 10), (-5, 5)])
+>>> res.basins
+>>> start = walker_starts(res.x, res.cov, nwalkers=32, bounds=res.bounds)
+"""
+import pickle
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+class NegLogLik:
+    """
+    Picklable negative log likelihood of f(p, x, obs, sigma), for minimisation.
+
+    Non-finite values are replaced by a large number, so optimisers
+    step back from them.
+    """
+    def __init__(self, loglik, x, obs, sigma=1):
+        self.loglik = loglik
+        self.args = (x, obs, sigma)
+
+    def __call__(self, p):
+        v = -self.loglik(p, *self.args)
+        return v if np.isfinite(v) else 1e300
+
+
+class BoundedLogLik:
+    """
+    Picklable log likelihood that is -inf outside of bounds (a flat prior).
+    """
+    def __init__(self, loglik, bounds):
+        self.loglik = loglik
+        self.lo, self.hi = np.asarray(bounds, dtype=float).T
+
+    def __call__(self, p, *args):
+        if np.any(p < self.lo) or np.any(p > self.hi):
+            return -np.inf
+        return self.loglik(p, *args)
+
+
+def lhs_starts(bounds, n, random_state=None):
+    """
+    n Latin hypercube samples within bounds, of shape (n, len(bounds)).
+    """
+    from scipy.stats import qmc
+
+    lo, hi = np.asarray(bounds, dtype=float).T
+    return qmc.scale(qmc.LatinHypercube(d=len(lo), seed=random_state).random(n), lo, hi)
+
+
+def _local_fit(fn, start, bounds, method):
+    from scipy.optimize import minimize
+
+    try:
+        res = minimize(fn, start, method=method, bounds=bounds)
+        return res.x, res.fun, bool(res.success)
+    except Exception:
+        return np.full(len(start), np.nan), np.inf, False
+
+
+def hessian(fn, x, rel_step=1e-4):
+    """
+    Central finite-difference Hessian of fn at x.
+    """
+    x = np.asarray(x, dtype=float)
+    n = x.size
+    h = rel_step * np.maximum(np.abs(x), 1e-2)
+    H = np.zeros((n, n))
+    f0 = fn(x)
+    for i in range(n):
+        ei = np.zeros(n)
+        ei[i] = h[i]
+        H[i, i] = (fn(x + ei) - 2 * f0 + fn(x - ei)) / h[i]**2
+        for j in range(i + 1, n):
+            ej = np.zeros(n)
+            ej[j] = h[j]
+            H[i, j] = H[j, i] = (fn(x + ei + ej) - fn(x + ei - ej)
+                                 - fn(x - ei + ej) + fn(x - ei - ej)) / (4 * h[i] * h[j])
+    return H
+
+
+def local_covariance(fn, x, bounds=None):
+    """
+    Covariance of the Gaussian approximation to exp(-fn) at its minimum x.
+
+    The inverse of the finite-difference Hessian. If that is not positive
+    definite, its diagonal (or a small fraction of the bounds' width) is
+    used instead.
+    """
+    H = hessian(fn, x)
+    try:
+        cov = np.linalg.inv(H)
+        np.linalg.cholesky(cov)
+        return cov
+    except np.linalg.LinAlgError:
+        d = np.diag(H)
+        if bounds is not None:
+            lo, hi = np.asarray(bounds, dtype=float).T
+            fallback = (1e-3 * (hi - lo))**2
+        else:
+            fallback = (1e-3 * np.maximum(np.abs(x), 1e-2))**2
+        return np.diag(np.where(d > 0, 1 / np.where(d > 0, d, 1), fallback))
+
+
+def cluster_optima(x, fun, scale, tol=1e-2):
+    """
+    Group optima into basins.
+
+    Optima are visited from best to worst, and join the first basin whose
+    best optimum is within tol (as a fraction of scale, in every parameter).
+
+    Returns
+    -------
+    numpy.ndarray of basin labels, where basin 0 is the best.
+    """
+    labels = np.full(len(x), -1)
+    centres = []
+    for i in np.argsort(fun):
+        if not np.all(np.isfinite(x[i])):
+            continue
+        for k, c in enumerate(centres):
+            if np.all(np.abs(x[i] - c) <= tol * scale):
+                labels[i] = k
+                break
+        else:
+            labels[i] = len(centres)
+            centres.append(x[i])
+    return labels
+
+
+def _picklable(obj):
+    try:
+        pickle.dumps(obj)
+        return True
+    except Exception:
+        return False
+
+
+def multistart(loglik, x, obs, sigma=1, bounds=None, nstarts=64, nproc=None, method=None,
+               tol=1e-2, random_state=None):
+    """
+    Maximise a log likelihood from many starting points, and cluster the optima.
+
+    Parameters
+    ----------
+    loglik : function
+        Of form f(p, x, obs, sigma), which returns the log likelihood.
+        Must be defined at module level to run across processes.
+    x, obs, sigma : array-like
+        Passed to loglik.
+    bounds : array-like
+        (min, max) of each parameter. Starting points are drawn within them.
+    nstarts : int
+        The number of local optimisations.
+    nproc : int
+        Number of processes. If 1, or loglik cannot be pickled, runs serially.
+        Processes only pay off when each optimisation takes longer than
+        starting the pool (roughly a second).
+    method : str
+        Passed to `scipy.optimize.minimize`. Defaults to L-BFGS-B.
+    tol : float
+        Optima within tol of the bounds' width (in every parameter) are
+        grouped into the same basin.
+    random_state : None, int or numpy.random.Generator
+        Seed for the starting points.
+
+    Returns
+    -------
+    scipy.optimize.OptimizeResult with
+        x, fun : the best parameters, and the negative log likelihood there.
+        cov : local covariance at x.
+        basins : pandas.DataFrame of the best optimum of each basin and
+            the number of starts that reached it, best first.
+        optima, fvals, labels, success : every local optimum, its value,
+            basin and convergence flag.
+        starts, bounds
+    """
+    from scipy.optimize import OptimizeResult
+
+    bounds = np.asarray(bounds, dtype=float)
+    method = method or 'L-BFGS-B'
+    fn = NegLogLik(loglik, x, obs, sigma)
+    starts = lhs_starts(bounds, nstarts, random_state)
+
+    if nproc != 1 and not _picklable(fn):
+        warnings.warn('loglik or data cannot be pickled, so multistart is running serially. '
+                      'Define loglik at module level to run in parallel.')
+        nproc = 1
+    if nproc == 1:
+        results = [_local_fit(fn, s, bounds, method) for s in starts]
+    else:
+        with ProcessPoolExecutor(nproc) as pool:
+            results = list(pool.map(_local_fit, [fn] * nstarts, starts, [bounds] * nstarts,
+                                    [method] * nstarts))
+
+    optima = np.array([r[0] for r in results])
+    fvals = np.array([r[1] for r in results])
+    success = np.array([r[2] for r in results])
+
+    labels = cluster_optima(optima, fvals, bounds[:, 1] - bounds[:, 0], tol)
+    rows = []
+    for k in range(labels.max() + 1):
+        members = np.where(labels == k)[0]
+        best = members[np.argmin(fvals[members])]
+        rows.append([k, len(members), fvals[best], *optima[best]])
+    basins = pd.DataFrame(rows, columns=['basin', 'count', 'fun'] +
+                          [f'p{i}' for i in range(bounds.shape[0])]).set_index('basin')
+
+    if not np.isfinite(fvals).any():
+        raise RuntimeError('None of the local optimisations found a finite likelihood.')
+    best = np.argmin(fvals)
+    return OptimizeResult(x=optima[best], fun=fvals[best],
+                          cov=local_covariance(fn, optima[best], bounds),
+                          basins=basins, optima=optima, fvals=fvals, labels=labels,
+                          success=success, starts=starts, bounds=bounds)
+
+
+def walker_starts(x, cov, nwalkers, bounds=None, scale=1., random_state=None):
+    """
+    Draw initial walker positions from a multivariate normal around x.
+
+    Parameters
+    ----------
+    x : array-like
+        Centre of the walkers.
+    cov : array-like
+        Covariance, e.g. from `multistart`. Multiplied by scale**2.
+    nwalkers : int
+    bounds : array-like
+        (min, max) of each parameter. Draws outside are redrawn.
+    scale : float
+        Scales the spread of the walkers.
+    random_state : None, int or numpy.random.Generator
+
+    Returns
+    -------
+    numpy.ndarray of shape (nwalkers, len(x))
+    """
+    rng = np.random.default_rng(random_state)
+    x = np.asarray(x, dtype=float)
+    cov = np.asarray(cov, dtype=float) * scale**2
+    out = rng.multivariate_normal(x, cov, nwalkers)
+    if bounds is not None:
+        lo, hi = np.asarray(bounds, dtype=float).T
+        for _ in range(100):
+            bad = np.any((out < lo) | (out > hi), axis=1)
+            if not bad.any():
+                break
+            out[bad] = rng.multivariate_normal(x, cov, bad.sum())
+        out = np.clip(out, lo, hi)
+    return out
@@ -0,0 +1,133 @@
+"""
+Batch fitting of peakshapes to many spectra.
+
+Fits are distributed across a process pool in contiguous blocks of spectra.
+Within each block, every fit is warm-started from the solution of the
+previous spectrum, which is usually a much better guess than a fixed p0
+when neighbouring spectra are similar (e.g. a time series or map).
+"""
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import curve_fit
+
+from . import peakshapes
+
+
+def get_model(model):
+    """
+    Return a peakshape function by name, or pass through a callable.
+
+    Parameters
+    ----------
+    model : str or callable
+        The name of a function in `otools.peakshapes` (e.g. 'gaussian'),
+        or a function of the form f(x, *p).
+
+    Returns
+    -------
+    callable
+    """
+    if callable(model):
+        return model
+    if not hasattr(peakshapes, model):
+        raise ValueError(f"Unknown peakshape '{model}'. Must be a function in otools.peakshapes, or a callable.")
+    return getattr(peakshapes, model)
+
+
+def _fit_block(x, Y, model, p0, bounds, warm_start, kwargs):
+    """
+    Fit a contiguous block of spectra in serial.
+
+    Returns
+    -------
+    (params, covariances, times, success) : tuple of arrays
+    """
+    fn = get_model(model)
+    nfit = Y.shape[0]
+    npar = len(p0)
+
+    params = np.full((nfit, npar), np.nan)
+    covs = np.full((nfit, npar, npar), np.nan)
+    times = np.zeros(nfit)
+    success = np.zeros(nfit, dtype=bool)
+
+    guess = np.asarray(p0, dtype=float)
+    for i in range(nfit):
+        t0 = time.perf_counter()
+        try:
+            p, cov = curve_fit(fn, x, Y[i], p0=guess, bounds=bounds, **kwargs)
+            params[i] = p
+            covs[i] = cov
+            success[i] = True
+            if warm_start:
+                guess = p
+        except (RuntimeError, ValueError):
+            # failed fit - fall back to original guess for the next spectrum
+            guess = np.asarray(p0, dtype=float)
+        times[i] = time.perf_counter() - t0
+
+    return params, covs, times, success
+
+
+def fit_peaks(x, Y, model, p0, bounds=(-np.inf, np.inf), nproc=None, nblocks=None,
+              warm_start=True, **kwargs):
+    """
+    Fit a peakshape to many spectra in parallel.
+
+    Parameters
+    ----------
+    x : array-like
+        The independent variable, shared by all spectra, of shape (n,).
+    Y : array-like
+        Spectra to fit, of shape (nspectra, n).
+    model : str or callable
+        The name of a function in `otools.peakshapes` (e.g. 'gaussian'),
+        or a function of the form f(x, *p). Must be picklable (i.e. defined
+        at module level) if nproc > 1.
+    p0 : array-like
+        Initial guess for the parameters of the first spectrum in each block.
+    bounds : 2-tuple of array-like
+        Lower and upper bounds on parameters, passed to `scipy.optimize.curve_fit`.
+    nproc : int
+        The number of worker processes. If None, uses the number of CPUs.
+        If 1, all fits are run in the calling process.
+    nblocks : int
+        The number of contiguous blocks to split spectra into. Each block is
+        fitted serially, with warm starts. Defaults to 4 * nproc.
+    warm_start : bool
+        If True, each fit starts from the solution of the previous spectrum
+        in the same block.
+    **kwargs
+        Passed to `scipy.optimize.curve_fit`.
+
+    Returns
+    -------
+    params, covs, times, success : tuple of arrays
+        params : (nspectra, npar) best fit parameters.
+        covs : (nspectra, npar, npar) parameter covariance matrices.
+        times : (nspectra,) wall time of each fit, in seconds.
+        success : (nspectra,) boolean, False where the fit failed. Failed
+            fits have NaN params and covs.
+    """
+    x = np.asarray(x, dtype=float)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    if nblocks is None:
+        nblocks = 4 * nproc
+    nblocks = max(1, min(nblocks, Y.shape[0]))
+
+    blocks = np.array_split(Y, nblocks)
+    args = (model, p0, bounds, warm_start, kwargs)
+
+    if nproc == 1:
+        results = [_fit_block(x, b, *args) for b in blocks]
+    else:
+        with ProcessPoolExecutor(nproc) as pool:
+            futures = [pool.submit(_fit_block, x, b, *args) for b in blocks]
+            results = [f.result() for f in futures]
+
+    return tuple(np.concatenate(r) for r in zip(*results))
@@ -4,6 +4,7 @@ Peakshape library. Largely redundant, and present in other libraries.
 e.g. scipy.stats, sklearn
 """
 import numpy as np
+from scipy.special import wofz
 
 def gaussian(x, area, cen, fwhm):
     """
@@ -1,43 +1,241 @@
-import urllib2
-from bs4 import BeautifulSoup
+"""
+Refresh elements.npz from the isotope pages of periodictable.com.
+
+Pages are fetched concurrently (asyncio, with a bounded number of requests
+in flight) and kept in a local cache. On later runs, cached pages are
+re-validated with conditional requests (ETag / Last-Modified), so only
+pages that changed are downloaded again, and `offline=True` re-parses the
+cache without touching the network.
+
+    python element_scraper.py --cache ./page_cache --out ../periodic_table/
+
+The site can be swapped for any server with the same page layout via
+`base_url` (e.g. a local http.server serving fixture pages).
+"""
+import os
 import re
-from multiprocessing import Pool
+import sys
+import json
+import asyncio
+import hashlib
+import argparse
+import urllib.error
+import urllib.request
+from html.parser import HTMLParser
+
 import pandas as pd
 
+base_url = 'http://www.periodictable.com/Properties/A/'
+index_page = 'StableIsotopes.html'
+
+re_link = re.compile(r'\.\./\.\./Isotopes/([0-9]+)\.[0-9]+/index\.html')
+
+
+class PageCache:
+    """
+    Pages and their HTTP validators, stored in a directory.
+
+    Parameters
+    ----------
+    path : str
+        Cache directory. Created if it does not exist.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, url, ext):
+        return os.path.join(self.path, hashlib.sha1(url.encode()).hexdigest() + ext)
+
+    def get(self, url):
+        """
+        (body, meta) of a cached page, or (None, {}) if it is not cached.
+        """
+        try:
+            with open(self._file(url, '.html'), 'rb') as f:
+                body = f.read()
+            with open(self._file(url, '.json')) as f:
+                return body, json.load(f)
+        except FileNotFoundError:
+            return None, {}
+
+    def put(self, url, body, meta):
+        for ext, data, mode in [('.html', body, 'wb'), ('.json', json.dumps({'url': url, **meta}), 'w')]:
+            tmp = self._file(url, ext) + '.tmp'
+            with open(tmp, mode) as f:
+                f.write(data)
+            os.replace(tmp, self._file(url, ext))
+
+
+def _get(url, meta, timeout):
+    """
+    Blocking conditional GET. Returns (status, body, validators).
+    """
+    headers = {'User-Agent': 'otools-element-scraper'}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as r:
+            return r.status, r.read(), {'etag': r.headers.get('ETag'),
+                                        'last_modified': r.headers.get('Last-Modified')}
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, None, meta
+        raise
+
+
+async def fetch(url, cache, semaphore, offline=False, timeout=30):
+    """
+    Return the body of url, from the cache if it has not changed.
+
+    Returns
+    -------
+    (body, status) : status is 200 if downloaded, 304 if the cached copy
+        was still valid, and 'cached' if it was used without checking.
+    """
+    body, meta = cache.get(url)
+    if offline:
+        if body is None:
+            raise FileNotFoundError(f'{url} is not in the cache.')
+        return body, 'cached'
+    async with semaphore:
+        status, new, validators = await asyncio.to_thread(_get, url, meta, timeout)
+    if status == 304 and body is not None:
+        return body, 304
+    cache.put(url, new, validators)
+    return new, status
+
+
+class _IsotopePage(HTMLParser):
+    """
+    Collects the isotope name (the text in <big><big><big>) and the
+    left/top aligned table cells that hold its mass and abundance.
+    """
+    def __init__(self):
+        super().__init__()
+        self.big = 0
+        self.name = None
+        self.in_cell = False
+        self.cells = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'big':
+            self.big += 1
+        elif tag == 'td' and attrs.get('align') == 'left' and attrs.get('valign') == 'top':
+            self.in_cell = True
+            self.cells.append('')
+
+    def handle_endtag(self, tag):
+        if tag == 'big':
+            self.big -= 1
+        elif tag == 'td':
+            self.in_cell = False
+
+    def handle_data(self, data):
+        if self.big >= 3 and self.name is None and data.strip():
+            self.name = data.strip()
+        if self.in_cell:
+            self.cells[-1] += data
+
+
+def parse_index(html):
+    """
+    Links to the isotope pages listed on the index page.
+    """
+    links = re.findall(r'href="(\.\./\.\./Isotopes/[^"]+)"', html)
+    return list(dict.fromkeys(links))
+
+
+def parse_isotope(html, link):
+    """
+    Parse one isotope page.
+
+    Returns
+    -------
+    dict with keys element, atomic_number, isotope, atomic_weight, percent.
+    """
+    page = _IsotopePage()
+    page.feed(html)
+    if page.name is None or len(page.cells) < 2:
+        raise ValueError(f'Unexpected page layout for {link}')
+    mass = page.cells[0].strip()
+    abundance = page.cells[1].strip().rstrip('%')
+    abundance = re.sub('1.×102', '100', abundance)
+    return {'element': re.sub('[0-9]', '', page.name),
+            'atomic_number': float(re_link.search(link).group(1)),
+            'isotope': int(re.sub('[^0-9]', '', page.name)),
+            'atomic_weight': float(mass),
+            'percent': float(abundance)}
+
+
+async def _scrape(base_url, cache, concurrency, offline, timeout):
+    semaphore = asyncio.Semaphore(concurrency)
+    index, _ = await fetch(base_url + index_page, cache, semaphore, offline, timeout)
+    links = parse_index(index.decode('utf-8', 'ignore'))
+    pages = await asyncio.gather(*(fetch(base_url + link, cache, semaphore, offline, timeout)
+                                   for link in links))
+    return links, pages
+
+
+def scrape(base_url=base_url, cache_dir='page_cache', out=None, concurrency=8,
+           offline=False, timeout=30):
+    """
+    Scrape isotope masses and abundances.
 
-# Scrape all the element data from periodictable.com
-def elementScrape(path="./"):
-    url = "http://www.periodictable.com/Properties/A/StableIsotopes.html"
-    urlbase = "http://www.periodictable.com/Properties/A/"
+    Parameters
+    ----------
+    base_url : str
+        URL of the directory containing the index page. Isotope links
+        are resolved relative to it.
+    cache_dir : str
+        Directory to cache pages in.
+    out : str
+        If given, the table is saved as elements.npz in this directory.
+    concurrency : int
+        Maximum number of requests in flight.
+    offline : bool
+        If True, only parse cached pages.
+    timeout : float
+        Timeout of each request, in seconds.
 
-    page = urllib2.urlopen(url)
-    soup = BeautifulSoup(page)
+    Returns
+    -------
+    pandas.DataFrame : as returned by `otools.chemistry.elements`. Its
+    `attrs['status']` counts pages by how they were obtained.
+    """
+    from otools.chemistry import save_elements
 
-    links = soup.find_all("a", href=re.compile('\.\.\/\.\.\/Isotopes'))
-    links = [elem['href'] for elem in links]
+    cache = PageCache(cache_dir)
+    links, pages = asyncio.run(_scrape(base_url, cache, concurrency, offline, timeout))
 
-    # print int(re.search(r"\.\.\/\.\.\/Isotopes\/([0-9]+)\.[0-9]\/index\.html", links[0]).group(1))
+    rows = [parse_isotope(body.decode('utf-8', 'ignore'), link) for link, (body, _) in zip(links, pages)]
+    df = pd.DataFrame(rows, columns=['element', 'atomic_number', 'isotope', 'atomic_weight', 'percent'])
+    df = df.sort_values(['atomic_number', 'isotope']).reset_index(drop=True)
+    df.attrs['status'] = pd.Series([str(s) for _, s in pages]).value_counts().to_dict()
 
-    def elscrape(i):
-        suburl = urlbase + i
-        subpage = urllib2.urlopen(suburl).read()
-        subsoup = BeautifulSoup(subpage.decode('utf-8', 'ignore'))
+    if out is not None:
+        save_elements(df, os.path.join(out, 'elements.npz'))
+    return df
 
-        element = subsoup.br.find_all("table")[3].big.big.big.text
-        mass = subsoup.br.findAll('td', align='left', valign="top")[0].text
-        abundance = subsoup.br.findAll('td', align='left', valign="top")[1].text[:-1]
-        abundance = re.sub(u"1.\\xd7102", "100", abundance)
-        electrons = re.search(r"\.\.\/\.\.\/Isotopes\/([0-9]+)\.[0-9]+\/index\.html", i).group(1)
-        return (str(element), float(mass), float(abundance), int(electrons))
 
-    pool = Pool(4)
-    isotopes = pool.map(elscrape, links)
-    pool.close()
-    pool.join()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Refresh elements.npz from periodictable.com.')
+    parser.add_argument('--base-url', default=base_url)
+    parser.add_argument('--cache', default='page_cache', help='Page cache directory.')
+    parser.add_argument('--out', default=os.path.dirname(os.path.abspath(__file__)),
+                        help='Directory to write elements.npz to.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--offline', action='store_true', help='Only re-parse cached pages.')
+    args = parser.parse_args(argv)
 
-    iso = pd.DataFrame(isotopes, columns=['isotope', 'mass', 'abundance', 'e'])
+    df = scrape(args.base_url, args.cache, args.out, args.concurrency, args.offline)
+    print(f"{len(df)} isotopes of {df.element.nunique()} elements. Pages: {df.attrs['status']}",
+          file=sys.stderr)
+    return 0
 
-    iso['element'] = iso['isotope'].str.replace(r'[0-9]', '')
-    iso['mass_n'] = iso['isotope'].str.replace(r'[A-Za-z]', '')
 
-    iso.to_pickle(path+'elements.pkl')
+if __name__ == '__main__':
+    sys.exit(main())
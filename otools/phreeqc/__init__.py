@@ -1,2 +1,33 @@
-from .phreeq import input_str, run_phreeqc
-from .montecarlo import mc_input_str
\ No newline at end of file
+"""
+Generating, running and parsing PHREEQC calculations.
+
+Functions are loaded on first access, so importing otools.phreeqc
+does not load phreeqpy, uncertainties or scipy.
+"""
+from importlib import import_module as _import_module
+
+_lazy = {
+    'input_str': '.phreeq',
+    'run_phreeqc': '.phreeq',
+    'mc_input_str': '.montecarlo',
+    'SpeciationTable': '.lookup',
+    'reaction_sweep_str': '.sweep',
+    'pH_sweep_str': '.sweep',
+    'modify_sweep_str': '.sweep',
+    'sweep_output': '.sweep',
+    'read_output': '.output',
+    'iter_output': '.output',
+    'ResultStore': '.store',
+}
+
+__all__ = list(_lazy)
+
+
+def __getattr__(name):
+    if name in _lazy:
+        return getattr(_import_module(_lazy[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy))
@@ -0,0 +1,260 @@
+"""
+Command-line batch speciation of large tables of solution compositions.
+
+The input table (CSV or Parquet) is read in chunks. Each chunk is passed
+through `input_str` and `run_phreeqc` on a pool of worker processes. At
+most `--max-pending` chunks are in flight at once, so reading never runs
+far ahead of calculation and memory use stays bounded. The output of
+each chunk is written to its own file as soon as it completes:
+
+    OUTPUT/
+        manifest.json
+        part-000000.parquet
+        part-000001.parquet
+        ...
+
+manifest.json records which chunks are finished. So an interrupted job
+can be resumed with `--resume`, which re-runs only the chunks that are
+missing. Each output row has a 'sample' column holding the row number of
+its input.
+
+Example
+-------
+    otools-speciate samples.csv results/ --chunksize 2000 --workers 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+
+from .phreeq import input_str, run_phreeqc, find_database
+
+
+def read_chunks(path, chunksize):
+    """
+    Read a CSV or Parquet file in chunks of rows.
+
+    Yields
+    ------
+    pandas.DataFrame
+    """
+    if path.endswith('.parquet') or path.endswith('.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Reading Parquet files requires pyarrow. Install it with `pip install pyarrow`.') from None
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def _records(df):
+    """
+    Convert a chunk into input dicts, leaving out missing values.
+    """
+    return [{k: v for k, v in r.items() if not (isinstance(v, float) and np.isnan(v))}
+            for r in df.to_dict('records')]
+
+
+def speciate_chunk(chunk, start, outputs=None, database=None, phreeq_path=None):
+    """
+    Run PHREEQC on one chunk of inputs.
+
+    Parameters
+    ----------
+    chunk : pandas.DataFrame
+        One row per solution, one column per PHREEQC input key.
+    start : int
+        Row number of the first row of the chunk in the full input.
+    outputs, database, phreeq_path
+        Passed to `input_str` and `run_phreeqc`.
+
+    Returns
+    -------
+    pandas.DataFrame : the selected output, with a 'sample' column.
+    """
+    kwargs = {} if phreeq_path is None else {'phreeq_path': phreeq_path}
+    out = run_phreeqc(input_str(_records(chunk), outputs=outputs), database=database, **kwargs)
+    if len(out) != len(chunk):
+        raise RuntimeError(f'PHREEQC returned {len(out)} rows for {len(chunk)} inputs.')
+    for c, d in out.items():
+        if d.dtype == object or pd.api.types.is_string_dtype(d):
+            try:
+                out[c] = pd.to_numeric(d)
+            except (ValueError, TypeError):
+                out[c] = d.astype(str).str.strip()
+    out.insert(0, 'sample', np.arange(start, start + len(out)))
+    return out
+
+
+class Manifest:
+    """
+    Record of the finished chunks of a job, kept in OUTPUT/manifest.json.
+    """
+    def __init__(self, outdir, settings, resume=False):
+        self.path = os.path.join(outdir, 'manifest.json')
+        self.data = {'settings': settings, 'done': {}, 'failed': {}, 'complete': False}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                old = json.load(f)
+            if not resume:
+                raise ValueError(f'{outdir} already contains a job. Use --resume to continue it.')
+            if old['settings'] != settings:
+                raise ValueError(f'Cannot resume: settings differ from the existing job.\n'
+                                 f'  existing: {old["settings"]}\n  new: {settings}')
+            self.data['done'] = old['done']
+        self.save()
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def is_done(self, i):
+        return str(i) in self.data['done']
+
+    def mark(self, i, filename=None, nrows=0, error=None):
+        if error is None:
+            self.data['done'][str(i)] = {'file': filename, 'nrows': int(nrows)}
+            self.data['failed'].pop(str(i), None)
+        else:
+            self.data['failed'][str(i)] = error
+        self.save()
+
+
+def write_part(df, outdir, i, fmt):
+    """
+    Write one chunk of output, atomically.
+    """
+    filename = f'part-{i:06d}.{fmt}'
+    tmp = os.path.join(outdir, filename + '.tmp')
+    if fmt == 'parquet':
+        df.to_parquet(tmp, index=False, engine='pyarrow')
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, os.path.join(outdir, filename))
+    return filename
+
+
+def _progress(done, rows, failed, t0, quiet):
+    if quiet:
+        return
+    rate = rows / max(time.time() - t0, 1e-9)
+    sys.stderr.write(f'\r{done} chunks ({rows} rows) done, {failed} failed, {rate:.0f} rows/s   ')
+    sys.stderr.flush()
+
+
+def run_job(input_path, output_dir, chunksize=1000, workers=None, max_pending=None, outputs=None,
+            database=None, phreeq_path=None, fmt=None, resume=False, quiet=False):
+    """
+    Speciate every row of a CSV or Parquet file. See module docstring.
+
+    Returns
+    -------
+    int : the number of chunks that failed.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    if fmt is None:
+        fmt = 'csv' if input_path.endswith('.csv') else 'parquet'
+    database = find_database(database)
+
+    os.makedirs(output_dir, exist_ok=True)
+    settings = {'input': os.path.abspath(input_path), 'chunksize': int(chunksize),
+                'outputs': outputs, 'database': database, 'format': fmt}
+    manifest = Manifest(output_dir, settings, resume=resume)
+
+    t0 = time.time()
+    rows = 0
+    failed = 0
+    pending = {}
+
+    def collect(futures):
+        nonlocal rows, failed
+        for f in futures:
+            i = pending.pop(f)
+            try:
+                df = f.result()
+                manifest.mark(i, write_part(df, output_dir, i, fmt), len(df))
+                rows += len(df)
+            except Exception as e:
+                failed += 1
+                manifest.mark(i, error=f'{type(e).__name__}: {e}')
+                if not quiet:
+                    sys.stderr.write(f'\nchunk {i} failed: {type(e).__name__}: {e}\n')
+        _progress(len(manifest.data['done']), rows, failed, t0, quiet)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        start = 0
+        for i, chunk in enumerate(read_chunks(input_path, chunksize)):
+            if not manifest.is_done(i):
+                # backpressure: wait for a free slot before reading further
+                while len(pending) >= max_pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                f = pool.submit(speciate_chunk, chunk, start, outputs, database, phreeq_path)
+                pending[f] = i
+            start += len(chunk)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+
+    manifest.data['complete'] = failed == 0
+    manifest.save()
+    if not quiet:
+        sys.stderr.write(f'\nFinished in {time.time() - t0:.1f} s. Output in {output_dir}\n')
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='otools-speciate',
+        description='Speciate a CSV or Parquet table of solution compositions with PHREEQC, '
+                    'in chunks on a pool of worker processes. Each column is a PHREEQC '
+                    'SOLUTION input key (e.g. pH, temp, units, Na, Cl), and each row a solution.')
+    parser.add_argument('input', help='Input .csv or .parquet file.')
+    parser.add_argument('output', help='Output directory.')
+    parser.add_argument('-c', '--chunksize', type=int, default=1000,
+                        help='Solutions per PHREEQC run (default: 1000).')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs).')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='Maximum chunks in flight at once (default: 2 x workers).')
+    parser.add_argument('-d', '--database', default=None,
+                        help="Included database name (e.g. 'pitzer') or path to a database file.")
+    parser.add_argument('-o', '--outputs', default=None,
+                        help='File containing SELECTED_OUTPUT options (default: otools default_output).')
+    parser.add_argument('--phreeq-path', default=None, help='Path to the IPhreeqc shared library.')
+    parser.add_argument('-f', '--format', choices=['csv', 'parquet'], default=None,
+                        help='Output format (default: csv for csv input, otherwise parquet).')
+    parser.add_argument('-r', '--resume', action='store_true',
+                        help='Resume an interrupted job in OUTPUT, skipping finished chunks.')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not report progress.')
+    args = parser.parse_args(argv)
+
+    outputs = None
+    if args.outputs is not None:
+        with open(args.outputs) as f:
+            outputs = f.read()
+
+    try:
+        failed = run_job(args.input, args.output, chunksize=args.chunksize, workers=args.workers,
+                         max_pending=args.max_pending, outputs=outputs, database=args.database,
+                         phreeq_path=args.phreeq_path, fmt=args.format, resume=args.resume,
+                         quiet=args.quiet)
+    except ValueError as e:
+        parser.exit(2, f'otools-speciate: error: {e}\n')
+    if failed:
+        sys.stderr.write(f'{failed} chunks failed. Re-run with --resume to retry them.\n')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
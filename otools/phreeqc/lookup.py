@@ -0,0 +1,264 @@
+"""
+Precomputed speciation lookup tables.
+
+PHREEQC is run once over a regular grid of input conditions (e.g. temp, pH
+and C), and the selected output is stored as an N-dimensional table.
+Later queries are answered by vectorised multilinear interpolation, with
+an estimate of the interpolation error from the curvature of the table.
+"""
+import os
+import itertools
+import numpy as np
+import pandas as pd
+
+from .phreeq import input_str, run_phreeqc
+
+# selected output columns that describe the calculation, rather than the solution
+bookkeeping = ['sim', 'state', 'soln', 'dist_x', 'time', 'step']
+
+
+class SpeciationTable:
+    """
+    An N-dimensional table of PHREEQC outputs on a regular grid of inputs.
+
+    Usually created with `SpeciationTable.build` or `SpeciationTable.load`.
+
+    Parameters
+    ----------
+    axes : dict
+        {input_key: 1D array} of grid coordinates. Each axis must be
+        strictly increasing.
+    fields : list of str
+        Names of the tabulated outputs.
+    values : array-like
+        Of shape (*[len(a) for a in axes.values()], len(fields)).
+    """
+    def __init__(self, axes, fields, values):
+        self.axes = {k: np.asarray(v, dtype=float) for k, v in axes.items()}
+        self.fields = list(fields)
+        self.values = values
+
+        for k, a in self.axes.items():
+            if a.ndim != 1 or np.any(np.diff(a) <= 0):
+                raise ValueError(f'Axis {k} must be 1D and strictly increasing.')
+        shape = tuple(a.size for a in self.axes.values()) + (len(self.fields),)
+        if values.shape != shape:
+            raise ValueError(f'values has shape {values.shape}, but axes and fields imply {shape}.')
+
+    @classmethod
+    def build(cls, axes, inputs=None, outputs=None, database=None, chunksize=10000, **kwargs):
+        """
+        Run PHREEQC over a grid of inputs, and tabulate the results.
+
+        Parameters
+        ----------
+        axes : dict
+            {input_key: 1D array} of grid coordinates, e.g.
+            {'temp': np.linspace(0, 40, 9), 'pH': np.linspace(7, 9, 21)}.
+        inputs : dict or callable
+            Either a dict of inputs that are constant across the grid (e.g. a
+            seawater composition), or a function that takes a dict of grid
+            coordinates and returns a complete PHREEQC input dict. The latter
+            allows axes that are not PHREEQC keys (e.g. salinity).
+        outputs : str or list
+            PHREEQC SELECTED_OUTPUT options, as in `input_str`. Defaults to
+            the boron and carbonate `default_output`.
+        database : str
+            Passed to `run_phreeqc`.
+        chunksize : int
+            The maximum number of solutions in each PHREEQC run.
+        **kwargs
+            Passed to `run_phreeqc`.
+
+        Returns
+        -------
+        SpeciationTable
+        """
+        names = list(axes)
+        grid = np.meshgrid(*(np.asarray(axes[k], dtype=float) for k in names), indexing='ij')
+        points = np.stack([g.ravel() for g in grid], -1)
+
+        if inputs is None:
+            inputs = {}
+        if callable(inputs):
+            make_input = inputs
+        else:
+            def make_input(point):
+                return {**inputs, **point}
+
+        results = []
+        for start in range(0, len(points), chunksize):
+            chunk = [make_input(dict(zip(names, p))) for p in points[start:start + chunksize]]
+            results.append(run_phreeqc(input_str(chunk, outputs=outputs), database=database, **kwargs))
+        out = pd.concat(results, ignore_index=True)
+        if len(out) != len(points):
+            raise ValueError(f'PHREEQC returned {len(out)} rows for {len(points)} grid points. '
+                             'Check that each input gives exactly one solution.')
+
+        out = out.drop(columns=[c for c in bookkeeping if c in out.columns])
+        out = out.apply(pd.to_numeric, errors='coerce')
+        values = out.values.reshape(grid[0].shape + (out.shape[1],))
+
+        return cls(axes, out.columns, values)
+
+    def save(self, path):
+        """
+        Save the table.
+
+        If path ends in '.npz', the table is saved as a single npz file.
+        Otherwise, path is a directory containing values.npy, which can be
+        memory-mapped by `load`, and axes.npz.
+        """
+        meta = {'names': np.array(list(self.axes)), 'fields': np.array(self.fields)}
+        meta.update({f'axis_{i}': a for i, a in enumerate(self.axes.values())})
+        if path.endswith('.npz'):
+            np.savez(path, values=self.values, **meta)
+        else:
+            os.makedirs(path, exist_ok=True)
+            np.save(os.path.join(path, 'values.npy'), self.values)
+            np.savez(os.path.join(path, 'axes.npz'), **meta)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        Load a table saved with `save`.
+
+        Parameters
+        ----------
+        path : str
+            Path to an .npz file or table directory.
+        mmap_mode : str
+            Passed to `numpy.load` for the table values, e.g. 'r'. Only
+            applies to tables saved as directories.
+
+        Returns
+        -------
+        SpeciationTable
+        """
+        if path.endswith('.npz'):
+            meta = np.load(path)
+            values = meta['values']
+        else:
+            meta = np.load(os.path.join(path, 'axes.npz'))
+            values = np.load(os.path.join(path, 'values.npy'), mmap_mode=mmap_mode)
+        names = [str(n) for n in meta['names']]
+        axes = {n: meta[f'axis_{i}'] for i, n in enumerate(names)}
+        return cls(axes, [str(f) for f in meta['fields']], values)
+
+    def _cells(self, points):
+        """
+        Lower cell index, fractional position and in-bounds mask along each axis.
+        """
+        idx = []
+        frac = []
+        inside = np.ones(len(next(iter(points.values()))), dtype=bool)
+        for k, a in self.axes.items():
+            x = np.asarray(points[k], dtype=float)
+            inside &= (x >= a[0]) & (x <= a[-1])
+            if a.size == 1:
+                idx.append(np.zeros(x.shape, dtype=int))
+                frac.append(np.zeros(x.shape))
+                continue
+            j = np.clip(np.searchsorted(a, x, side='right') - 1, 0, a.size - 2)
+            idx.append(j)
+            frac.append((x - a[j]) / (a[j + 1] - a[j]))
+        return idx, frac, inside
+
+    def curvature(self, i, node):
+        """
+        Absolute second derivative of each field along axis i, at grid nodes.
+
+        Calculated from the three nodes around each node along axis i, so
+        only those are read from the table (which may be memory-mapped).
+        Nodes at the edge take the curvature of their neighbour.
+
+        Parameters
+        ----------
+        i : int
+            Index of the axis, which must have at least 3 nodes.
+        node : tuple of int arrays
+            Node indices along each axis.
+
+        Returns
+        -------
+        numpy.ndarray of shape (len(node[0]), len(fields)).
+        """
+        a = list(self.axes.values())[i]
+        if a.size < 3:
+            raise ValueError(f'Axis {list(self.axes)[i]} has {a.size} nodes, but curvature needs at least 3.')
+        c = np.clip(node[i], 1, a.size - 2)
+        hl = (a[c] - a[c - 1])[:, np.newaxis]
+        hr = (a[c + 1] - a[c])[:, np.newaxis]
+
+        def at(j):
+            return np.asarray(self.values[node[:i] + (j,) + node[i + 1:]], dtype=float)
+
+        d2 = 2 * (hl * at(c + 1) - (hl + hr) * at(c) + hr * at(c - 1)) / (hl * hr * (hl + hr))
+        return np.abs(d2)
+
+    def query(self, points=None, return_error=False, **kwargs):
+        """
+        Interpolate the table at arbitrary points.
+
+        Parameters
+        ----------
+        points : dict or pandas.DataFrame
+            {axis: array} of coordinates to query. May also be given as
+            keyword arguments, e.g. table.query(temp=25, pH=[7.9, 8.1]).
+            Points outside the grid return NaN.
+        return_error : bool
+            If True, also return an estimate of the maximum interpolation
+            error, sum_i h_i**2 / 8 * max|d2f/dx_i2| over the enclosing cell.
+            Every axis with more than one node must have at least 3 nodes
+            to estimate its curvature.
+
+        Returns
+        -------
+        pandas.DataFrame of interpolated fields, or a tuple of
+        (values, errors) DataFrames if return_error is True.
+        """
+        points = {} if points is None else points
+        points = dict({k: np.asarray(points[k]) for k in points}, **kwargs)
+        missing = [k for k in self.axes if k not in points]
+        if missing:
+            raise ValueError(f'No coordinates given for axes: {missing}')
+        arrays = np.broadcast_arrays(*(np.atleast_1d(np.asarray(points[k], dtype=float)) for k in self.axes))
+        points = {k: a.ravel() for k, a in zip(self.axes, arrays)}
+
+        idx, frac, inside = self._cells(points)
+        n = len(inside)
+        out = np.zeros((n, len(self.fields)))
+        steps = [(0, 1) if a.size > 1 else (0,) for a in self.axes.values()]
+
+        for corner in itertools.product(*steps):
+            w = np.ones(n)
+            for c, t in zip(corner, frac):
+                w *= t if c else 1 - t
+            node = tuple(j + c for j, c in zip(idx, corner))
+            out += w[:, np.newaxis] * self.values[node]
+        out[~inside] = np.nan
+        out = pd.DataFrame(out, columns=self.fields)
+
+        if not return_error:
+            return out
+
+        short = [k for k, a in self.axes.items() if a.size == 2]
+        if short:
+            raise ValueError(f'Cannot estimate interpolation error along axes {short}, '
+                             'which need at least 3 nodes.')
+        err = np.zeros((n, len(self.fields)))
+        for i, a in enumerate(self.axes.values()):
+            if a.size == 1:
+                # queries must lie on the single node, so there is no error
+                continue
+            h = a[idx[i] + 1] - a[idx[i]]
+            cmax = np.zeros((n, len(self.fields)))
+            for corner in itertools.product(*steps):
+                node = tuple(j + c for j, c in zip(idx, corner))
+                cmax = np.maximum(cmax, self.curvature(i, node))
+            err += h[:, np.newaxis]**2 / 8 * cmax
+        err[~inside] = np.nan
+        return out, pd.DataFrame(err, columns=self.fields)
+
+    def __call__(self, points=None, **kwargs):
+        return self.query(points, **kwargs)
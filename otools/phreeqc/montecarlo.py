@@ -1,4 +1,6 @@
 from .phreeq import input_str, run_phreeqc
+from ..profiling import instrument, span
+import numpy as np
 import uncertainties as un
 from scipy import stats
 
@@ -18,7 +20,38 @@ class dummy_numeric:
     def rvs(self):
         return self.num
 
-def mc_input_dicts(input_dict, N, outputs=None):
+def correlated_draws(values, N, random_state=None):
+    """
+    Draw N samples of correlated uncertainties objects in one step.
+
+    Uses the joint covariance matrix tracked by `uncertainties`, and its
+    Cholesky decomposition to transform independent normal draws.
+
+    Parameters
+    ----------
+    values : list of uncertainties objects
+    N : int
+        The number of samples to draw.
+    random_state : None, int or numpy.random.Generator
+        Seed for the random draws.
+
+    Returns
+    -------
+    numpy.ndarray of shape (N, len(values))
+    """
+    rng = np.random.default_rng(random_state)
+    mean = np.array([v.nominal_value for v in values])
+    cov = np.array(un.covariance_matrix(values))
+    try:
+        L = np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        # singular covariance (e.g. values that are exact functions of each other)
+        w, V = np.linalg.eigh(cov)
+        L = V * np.sqrt(np.clip(w, 0, None))
+    return mean + rng.standard_normal((N, len(values))) @ L.T
+
+
+def mc_input_dicts(input_dict, N, outputs=None, *, random_state=None):
     """
     Generates phreeqc input dicts for Monte-Carlo uncertainties
     
@@ -29,44 +62,67 @@ def mc_input_dicts(input_dict, N, outputs=None):
             - string, float or int : the value will be used for all iterations.
             - tuple : the first value will be taken as the mean, the second as 
               the standard deviation
-            - uncertainties.core.Variable object : the nominal_value and std_dev
-              will be used.
+            - uncertainties object : drawn from a multivariate normal
+              distribution with the joint covariance of all uncertainties
+              objects in input_dict, so correlations between entries are kept.
             - A scipy `rv_frozen` distribution object
             - a custom object that contains a `.rvs()` method to generate a draw
               for each iteration.
-        In practice, all of the former are converted into objects with a 'rvs()'
-        method before performing the iteration.
+        All draws except those from custom objects are generated in bulk
+        before iteration.
     N : int
         The number of monte-carlo iterations to generate.
     outputs : str or list
-        a complete phreeqc output string, or a list of lines of an output string.
+        Unused. Kept for compatibility.
+    random_state : None, int or numpy.random.Generator
+        Seed for the random draws. Custom `.rvs()` objects are not seeded.
 
     Returns
     -------
     generator : where each iteration yields a new random dict drawn from the inputs.
     """
-    
-    # construct input dict of objects with .rvs() methods
-    dists = {}
-    for k, v in input_dict.items():
-        if isinstance(v, str):
-            dists[k] = dummy_str(v)
-        elif isinstance(v, (float, int)):
-            dists[k] = dummy_numeric(v)
-        elif isinstance(v, un.core.Variable):
-            dists[k] = stats.norm(v.nominal_value, v.std_dev)
-        elif isinstance(v, tuple):
-            dists[k] = stats.norm(v[0], v[1])
-        elif hasattr(v, 'rvs'):
-            dists[k] = v
-        else:
-            raise ValueError('Entry for {k} is invalid. See function doc for valid entry types.')
-    
+    rng = np.random.default_rng(random_state)
+
+    constants = {}
+    correlated = {}
+    draws = {}
+    custom = {}
+    with span('phreeqc.mc_input_dicts'):
+        for k, v in input_dict.items():
+            if isinstance(v, str):
+                constants[k] = v
+            elif isinstance(v, (float, int)):
+                constants[k] = v
+            elif isinstance(v, un.core.AffineScalarFunc):
+                correlated[k] = v
+            elif isinstance(v, tuple):
+                draws[k] = stats.norm(v[0], v[1]).rvs(N, random_state=rng)
+            elif isinstance(v, stats.distributions.rv_frozen):
+                draws[k] = v.rvs(N, random_state=rng)
+            elif hasattr(v, 'rvs'):
+                custom[k] = v
+            else:
+                raise ValueError(f'Entry for {k} is invalid. See function doc for valid entry types.')
+
+        if correlated:
+            samples = correlated_draws(list(correlated.values()), N, random_state=rng)
+            for i, k in enumerate(correlated):
+                draws[k] = samples[:, i]
+
     for i in range(N):
-        yield {k: v.rvs() for k, v in dists.items()}
+        out = {}
+        for k in input_dict:
+            if k in constants:
+                out[k] = constants[k]
+            elif k in draws:
+                out[k] = draws[k][i]
+            else:
+                out[k] = custom[k].rvs()
+        yield out
 
 
-def mc_input_str(input_dict, N, outputs=None):
+@instrument('phreeqc.mc_input_str')
+def mc_input_str(input_dict, N, outputs=None, *, random_state=None):
     """
     Generates phreeqc input string for Monte-Carlo uncertainties
     
@@ -77,21 +133,22 @@ def mc_input_str(input_dict, N, outputs=None):
             - string, float or int : the value will be used for all iterations.
             - tuple : the first value will be taken as the mean, the second as 
               the standard deviation
-            - uncertainties.core.Variable object : the nominal_value and std_dev
-              will be used.
+            - uncertainties object : drawn with the joint covariance of all
+              uncertainties objects in input_dict.
             - A scipy `rv_frozen` distribution object
             - a custom object that contains a `.rvs()` method to generate a draw
               for each iteration.
-        In practice, all of the former are converted into objects with a 'rvs()'
-        method before performing the iteration.
+        See `mc_input_dicts`.
     N : int
         The number of monte-carlo iterations to generate.
     outputs : str or list
         a complete phreeqc output string, or a list of lines of an output string.
+    random_state : None, int or numpy.random.Generator
+        Seed for the random draws.
 
     Returns
     -------
-    generator : where each iteration yields a new random dict drawn from the inputs.
+    str : phreeqc input string containing N solutions.
     """
 
-    return input_str(mc_input_dicts(input_dict=input_dict, N=N, outputs=outputs))
\ No newline at end of file
+    return input_str(mc_input_dicts(input_dict=input_dict, N=N, random_state=random_state), outputs=outputs)
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""
+Streaming parser for full PHREEQC output (.out) files.
+
+The file is read line by line (optionally through a memory map), and the
+'Description of solution', 'Distribution of species' and 'Saturation
+indices' blocks of every calculation are collected into columnar tables.
+Tables are yielded in chunks, so memory use is bounded by the chunk size,
+not the file size.
+"""
+import mmap
+import re
+import numpy as np
+import pandas as pd
+
+# columns identifying each calculation, as in the selected output
+id_columns = ['calc', 'sim', 'state', 'soln', 'step']
+
+species_columns = ['species', 'molality', 'activity', 'log_molality',
+                   'log_activity', 'log_gamma', 'mole_V']
+phase_columns = ['phase', 'SI', 'log_IAP', 'log_K', 'formula']
+
+# column dtypes, so that tables (including empty ones) are typed consistently across chunks
+dtypes = dict.fromkeys(id_columns, 'int64') | dict.fromkeys(species_columns + phase_columns, 'float64')
+dtypes.update(state=str, species=str, phase=str, formula=str)
+
+sections = {'Description of solution': 'description',
+            'Distribution of species': 'species',
+            'Saturation indices': 'phases'}
+
+re_sim = re.compile(r'^Reading input data for simulation (\d+)\.')
+re_soln = re.compile(r'^Initial solution (\d+)\.')
+re_step = re.compile(r'^Reaction step (\d+)\.')
+re_using = re.compile(r'^Using solution (\d+)\.')
+re_section = re.compile(r'^-+([A-Za-z ]+?)-+\s*$')
+
+
+def _float(s):
+    try:
+        return float(s)
+    except ValueError:
+        return np.nan
+
+
+def _lines(path, use_mmap):
+    if use_mmap:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                for line in iter(m.readline, b''):
+                    yield line.decode('latin-1')
+    else:
+        with open(path, 'r', encoding='latin-1') as f:
+            yield from f
+
+
+class _Table:
+    """
+    Column-wise accumulator for one output table.
+    """
+    def __init__(self, columns):
+        self.columns = columns
+        self.clear()
+
+    def clear(self):
+        self.data = {c: [] for c in self.columns}
+        self.n = 0
+
+    def append(self, row):
+        for c, v in zip(self.columns, row):
+            self.data[c].append(v)
+        self.n += 1
+
+    def frame(self):
+        df = pd.DataFrame(self.data, columns=self.columns).astype({c: dtypes[c] for c in self.columns})
+        self.clear()
+        return df
+
+
+def iter_output(path, chunk_rows=100000, use_mmap=False):
+    """
+    Parse a PHREEQC output file in chunks.
+
+    Parameters
+    ----------
+    path : str
+        Path to a PHREEQC output file (e.g. written by `run_phreeqc`
+        with output_file=True).
+    chunk_rows : int
+        A chunk is yielded once the species table reaches this many rows.
+    use_mmap : bool
+        If True, read the file through a read-only memory map.
+
+    Yields
+    ------
+    dict of pandas.DataFrame
+        With keys 'description' (one row per calculation, one column per
+        quantity), 'species' (one row per species per calculation) and
+        'phases' (one row per phase per calculation). All tables start
+        with the columns calc, sim, state, soln and step, where calc is
+        a running count of calculations in the file. A calculation that
+        spans two chunks appears in the 'description' table of both.
+    """
+    species = _Table(id_columns + species_columns)
+    phases = _Table(id_columns + phase_columns)
+    description = []
+
+    calc = -1
+    sim, state, soln, step = 0, '', -99, -99
+    section = None
+    seen = set()
+
+    def flush():
+        desc = pd.DataFrame(description, columns=None if description else id_columns)
+        return {'description': desc.astype({c: dtypes[c] for c in id_columns}),
+                'species': species.frame(),
+                'phases': phases.frame()}
+
+    for line in _lines(path, use_mmap):
+        # headers that start a new calculation, or change the context
+        if line[:1] not in (' ', '\t', '\n'):
+            m = re_section.match(line)
+            if m:
+                section = sections.get(m.group(1).strip())
+                continue
+            m = re_sim.match(line)
+            if m:
+                sim = int(m.group(1))
+                section = None
+                continue
+            if line.startswith('Beginning of initial solution'):
+                state, step = 'i_soln', -99
+                continue
+            if line.startswith('Beginning of batch-reaction'):
+                state = 'react'
+                continue
+            m = re_soln.match(line) or re_step.match(line)
+            if m:
+                if m.re is re_soln:
+                    soln = int(m.group(1))
+                else:
+                    step = int(m.group(1))
+                calc += 1
+                seen = set()
+                section = None
+                description.append(dict(zip(id_columns, (calc, sim, state, soln, step))))
+                continue
+            m = re_using.match(line)
+            if m:
+                soln = int(m.group(1))
+                description[-1]['soln'] = soln
+                continue
+            if section == 'phases' and line.startswith('**'):
+                section = None
+            continue
+
+        if section is None or calc < 0:
+            continue
+
+        ids = (calc, sim, state, soln, step)
+        if section == 'description':
+            if '=' in line:
+                k, v = line.split('=', 1)
+                v = v.split()
+                if v:
+                    description[-1][' '.join(k.split())] = _float(v[0])
+        elif section == 'species':
+            tokens = line.split()
+            if len(tokens) >= 6 and tokens[0] not in seen:
+                values = [_float(t) for t in tokens[1:7]]
+                if not np.isnan(values[0]):
+                    seen.add(tokens[0])
+                    values += [np.nan] * (6 - len(values))
+                    species.append(ids + (tokens[0], *values))
+        elif section == 'phases':
+            tokens = line.split()
+            if len(tokens) >= 4:
+                values = [_float(t) for t in tokens[1:4]]
+                if not np.isnan(values[0]):
+                    phases.append(ids + (tokens[0], *values, ' '.join(tokens[4:])))
+
+        if species.n >= chunk_rows:
+            yield flush()
+            # keep the current calculation's description for the next chunk
+            description = description[-1:]
+
+    if species.n or phases.n or description:
+        yield flush()
+
+
+def read_output(path, chunk_rows=100000, use_mmap=False, tables=('description', 'species', 'phases')):
+    """
+    Parse a PHREEQC output file into tables.
+
+    Parameters
+    ----------
+    path : str
+        Path to a PHREEQC output file.
+    chunk_rows : int
+        Passed to `iter_output`.
+    use_mmap : bool
+        If True, read the file through a read-only memory map.
+    tables : tuple of str
+        Which of 'description', 'species' and 'phases' to keep.
+
+    Returns
+    -------
+    dict of pandas.DataFrame
+        See `iter_output`.
+    """
+    chunks = {t: [] for t in tables}
+    for chunk in iter_output(path, chunk_rows=chunk_rows, use_mmap=use_mmap):
+        for t in tables:
+            chunks[t].append(chunk[t])
+
+    out = {}
+    for t, c in chunks.items():
+        df = pd.concat(c, ignore_index=True) if c else pd.DataFrame()
+        if t == 'description' and len(df):
+            # descriptions split across chunks are merged back together
+            df = df.groupby('calc', as_index=False, sort=False).first()
+        out[t] = df
+    return out
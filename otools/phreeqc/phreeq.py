@@ -3,11 +3,10 @@ Functions for calculating the speciation of C and B in precipitation solutions.
 """
 
 import os
+import importlib.resources as resources
 import pandas as pd
-import phreeqpy.iphreeqc.phreeqc_dll as phreeqc_mod
 
-import pkg_resources as pkgrs
-import os
+from ..profiling import instrument, span
 
 default_output = """    -pH
     -temperature
@@ -26,8 +25,27 @@ default_output = """    -pH
     """
 
 def get_database_path(database_name='pitzer'):
-    database_dir = os.path.join(pkgrs.resource_filename('otools.phreeqc', 'resources'), 'database')
-    return os.path.join(database_dir, database_name.replace('.dat', '') + '.dat')
+    database_dir = resources.files('otools.phreeqc') / 'resources' / 'database'
+    return str(database_dir / (database_name.replace('.dat', '') + '.dat'))
+
+def find_database(database=None):
+    """
+    Full path to a PHREEQC database.
+
+    Parameters
+    ----------
+    database : str
+        Name of an included database (e.g. 'pitzer'), or a path to a
+        database file. If None, the included pitzer database is used.
+    """
+    if database is None:
+        database = get_database_path()
+    elif not os.path.exists(database):
+        database = get_database_path(database)
+
+    if not os.path.exists(database):
+        raise ValueError(f"Can't phreeqc database: {database}\n   Please check that it exists.")
+    return database
 
 def make_solution(inputs, n=1):
     inp = [f"SOLUTION {int(n):d}"]
@@ -38,44 +56,62 @@ def make_solution(inputs, n=1):
             inp.append(f'    {k:20s}{float(v):.8e}')
     return '\n'.join(inp) + '\n'
 
+@instrument('phreeqc.input_str')
 def input_str(inputs, outputs=None):
     """
     Generate an input for calculating PHREEQC solutions.
 
     Parameters
     ----------
-    inputs : dict, or list of dicts
+    inputs : dict, list of dicts or pandas.DataFrame
         Where each key is a valid PHREEQC input key, and each 
         value is its value.
         
-        If a dict of dicts, multiple solutions are specified for 
+        If a list of dicts, multiple solutions are specified for 
         calculation with the names of the input dicts.
+
+        If a DataFrame, each row is a solution and each column
+        a PHREEQC input key (e.g. the output of 
+        `otools.seawater.compositions`).
     
     outputs : array-like or string
         A full output string or a list of output lines.
     """
     # inputs
     solutions = []
-    if hasattr(inputs, '__iter__'):
+    if isinstance(inputs, pd.DataFrame):
+        inputs = inputs.to_dict('records')
+    if isinstance(inputs, dict):
+        solutions.append(make_solution(inputs, 1))
+    else:
         for n, v in enumerate(inputs):
             solutions.append(make_solution(v, n))
-    else:
-        solutions.append(make_solution(inputs), 1)
 
-    # outputs
+    return '\n'.join(solutions) + '\n' + selected_output(outputs) + '\nEND'
+
+def selected_output(outputs=None):
+    """
+    Generate a SELECTED_OUTPUT block.
+
+    Parameters
+    ----------
+    outputs : array-like or string
+        A full output string or a list of output lines.
+        If None, `default_output` is used.
+    """
     output = ['SELECTED_OUTPUT']
     if outputs is None:
         # if not specified, use default (defined at top ^)
         output.append(default_output)
-    elif isinstance(output, str):
+    elif isinstance(outputs, str):
         # if it's a string
         output.append(outputs.replace('SELECTED_OUTPUT', ''))
     else:
         # if it's a list
         output += outputs
-    
-    return '\n'.join(solutions) + '\n' + '\n'.join(output) + '\nEND'
+    return '\n'.join(output)
 
+@instrument('phreeqc.run_phreeqc')
 def run_phreeqc(input_string, database=None, phreeq_path='/usr/local/lib/libiphreeqc.so', output_file=False):
     """
     Run input string in phreeqc with specified database.
@@ -90,25 +126,29 @@ def run_phreeqc(input_string, database=None, phreeq_path='/usr/local/lib/libiphr
     phreeq_path : str
         Path to iphreeqc shared library. Defaults to '/usr/local/lib/libiphreeqc.so',
         which should work for standard installs on Linux machines
+    output_file : bool
+        If True, PHREEQC also writes its full text output to 'phreeqc.0.out'
+        in the working directory. This can be parsed with
+        `otools.phreeqc.output.read_output`.
 
     Returns
     -------
     pandas.Series of calculated species
     """
+    import phreeqpy.iphreeqc.phreeqc_dll as phreeqc_mod
+
     if database is None:
         print('No database specified  :  using pitzer')
-        database = get_database_path()
-    elif not os.path.exists(database):
-        database = os.path.join(get_database_path(database))
-
-    if not os.path.exists(database):
-        raise ValueError(f"Can't phreeqc database: {database}\n   Please check that it exists.")
+    database = find_database(database)
 
-    phreeqc = phreeqc_mod.IPhreeqc(phreeq_path)
-    phreeqc.load_database(database)
+    with span('load_database'):
+        phreeqc = phreeqc_mod.IPhreeqc(phreeq_path)
+        phreeqc.load_database(database)
     if output_file:
         phreeqc.set_output_file_on()
-    phreeqc.run_string(input_string)
-    out = phreeqc.get_selected_output_array()
-    return pd.DataFrame(out[1:], columns=out[0])
+    with span('run'):
+        phreeqc.run_string(input_string)
+    with span('to_dataframe'):
+        out = phreeqc.get_selected_output_array()
+        return pd.DataFrame(out[1:], columns=out[0])
 
@@ -0,0 +1,319 @@
+"""
+Partitioned Parquet storage for Monte Carlo speciation runs.
+
+Each run is stored as a hive-partitioned pair of datasets on disk:
+
+    path/
+        runs/<run>.json              metadata (seed, database and its sha256, ...)
+        inputs/run=<run>/part-*.parquet
+        outputs/run=<run>/part-*.parquet
+
+Every chunk of PHREEQC inputs and outputs is appended as a new part, so
+results are saved as they are calculated. Rows in both tables are linked
+by a 'sample' column. Reads go through `pyarrow.dataset`, so only the
+requested columns and runs are loaded, and summaries are accumulated one
+record batch at a time.
+
+Requires pyarrow.
+"""
+import os
+import json
+import hashlib
+import itertools
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from .phreeq import input_str, run_phreeqc, find_database
+from .montecarlo import mc_input_dicts
+
+tables = ('inputs', 'outputs')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('ResultStore requires pyarrow. Install it with `pip install pyarrow`.') from None
+    return pyarrow
+
+
+def file_sha256(path, blocksize=2**20):
+    """
+    sha256 hex digest of a file.
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _typed(df):
+    """
+    Convert columns to float64 where possible, and strip strings otherwise.
+    """
+    out = {}
+    for c, d in df.items():
+        if d.dtype == object or pd.api.types.is_string_dtype(d):
+            try:
+                d = pd.to_numeric(d)
+            except (ValueError, TypeError):
+                d = d.astype(str).str.strip()
+        if pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d):
+            d = d.astype('float64')
+        out[str(c)] = d
+    return pd.DataFrame(out, index=df.index)
+
+
+class ResultStore:
+    """
+    A directory of PHREEQC inputs and outputs, partitioned by run.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the store. Created if it does not exist.
+
+    Example
+    -------
+    >>> store = ResultStore('results')
+    >>> run = store.run_mc({'pH': (8.1, 0.05), 'temp': 25, 'C': (2.0, 0.05)}, N=10**6, seed=42)
+    >>> store.summary(['pH', 'm_CO3-2(mol/kgw)'], runs=run)
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.join(path, 'runs'), exist_ok=True)
+
+    def _meta_path(self, run):
+        return os.path.join(self.path, 'runs', f'{run}.json')
+
+    def new_run(self, run=None, seed=None, database=None, **meta):
+        """
+        Register a new run, and save its metadata.
+
+        Parameters
+        ----------
+        run : str
+            Name of the run. Defaults to the current time.
+        seed : int
+            The seed used to draw the run's inputs.
+        database : str
+            The PHREEQC database used. Its full path and sha256 are recorded.
+        **meta
+            Any other JSON-serialisable information to record.
+
+        Returns
+        -------
+        str : the run name.
+        """
+        if run is None:
+            run = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        run = str(run)
+        if os.path.exists(self._meta_path(run)):
+            raise ValueError(f'Run {run} already exists in {self.path}.')
+
+        database = find_database(database)
+        meta = {'run': run,
+                'created': datetime.now().isoformat(),
+                'seed': seed,
+                'database': database,
+                'database_sha256': file_sha256(database),
+                'nrows': 0,
+                **meta}
+        self._write_meta(run, meta)
+        return run
+
+    def _write_meta(self, run, meta):
+        tmp = self._meta_path(run) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=2, default=str)
+        os.replace(tmp, self._meta_path(run))
+
+    def metadata(self, run):
+        """
+        The metadata dict of a run.
+        """
+        with open(self._meta_path(run)) as f:
+            return json.load(f)
+
+    @property
+    def runs(self):
+        """
+        pandas.DataFrame of the metadata of all runs in the store.
+        """
+        files = sorted(f for f in os.listdir(os.path.join(self.path, 'runs')) if f.endswith('.json'))
+        return pd.DataFrame([self.metadata(f[:-5]) for f in files])
+
+    def append(self, run, inputs, outputs):
+        """
+        Append a chunk of inputs and their outputs to a run.
+
+        Parameters
+        ----------
+        run : str
+            A run created by `new_run`.
+        inputs : pandas.DataFrame or list of dicts
+            The PHREEQC inputs of each solution.
+        outputs : pandas.DataFrame
+            The output of `run_phreeqc`, with one row per input.
+        """
+        pa = _pyarrow()
+        meta = self.metadata(run)
+        inputs = pd.DataFrame(inputs).reset_index(drop=True)
+        outputs = pd.DataFrame(outputs).reset_index(drop=True)
+        if len(inputs) != len(outputs):
+            raise ValueError(f'{len(inputs)} inputs but {len(outputs)} outputs.')
+
+        sample = np.arange(meta['nrows'], meta['nrows'] + len(inputs), dtype=np.int64)
+        for table, df in zip(tables, (inputs, outputs)):
+            df = _typed(df)
+            df.insert(0, 'sample', sample)
+            part = os.path.join(self.path, table, f'run={run}')
+            os.makedirs(part, exist_ok=True)
+            n = len(os.listdir(part))
+            pa.parquet.write_table(pa.Table.from_pandas(df, preserve_index=False),
+                                   os.path.join(part, f'part-{n:05d}.parquet'))
+
+        meta['nrows'] += len(inputs)
+        self._write_meta(run, meta)
+
+    def run_mc(self, input_dict, N, chunksize=10000, outputs=None, database=None,
+               seed=None, run=None, **kwargs):
+        """
+        Run a Monte Carlo speciation calculation, saving each chunk as it completes.
+
+        Parameters
+        ----------
+        input_dict : dict
+            Inputs and their uncertainties, as in `mc_input_str`.
+        N : int
+            The number of Monte Carlo iterations.
+        chunksize : int
+            The number of solutions in each PHREEQC run.
+        outputs : str or list
+            SELECTED_OUTPUT options, as in `input_str`.
+        database : str
+            Passed to `run_phreeqc`.
+        seed : int
+            Seed for the random draws. If None, a seed is generated and
+            recorded, so the run can be reproduced.
+        run : str
+            Name of the run. Defaults to the current time.
+        **kwargs
+            Passed to `run_phreeqc`.
+
+        Returns
+        -------
+        str : the run name.
+        """
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2**63)
+        run = self.new_run(run=run, seed=seed, database=database, N=int(N),
+                           chunksize=int(chunksize), outputs=outputs)
+        database = self.metadata(run)['database']
+
+        draws = mc_input_dicts(input_dict, int(N), random_state=seed)
+        while True:
+            chunk = list(itertools.islice(draws, chunksize))
+            if not chunk:
+                break
+            out = run_phreeqc(input_str(chunk, outputs=outputs), database=database, **kwargs)
+            self.append(run, chunk, out)
+        return run
+
+    def dataset(self, table='outputs'):
+        """
+        The `pyarrow.dataset.Dataset` of a table, with 'run' as a partition column.
+        """
+        pa = _pyarrow()
+        partitioning = pa.dataset.partitioning(pa.schema([('run', pa.string())]), flavor='hive')
+        return pa.dataset.dataset(os.path.join(self.path, table), format='parquet',
+                                  partitioning=partitioning)
+
+    def _filter(self, runs, filter):
+        pa = _pyarrow()
+        if runs is not None:
+            runs = [runs] if isinstance(runs, str) else list(runs)
+            expr = pa.dataset.field('run').isin(runs)
+            filter = expr if filter is None else expr & filter
+        return filter
+
+    def iter_batches(self, table='outputs', columns=None, runs=None, filter=None, batch_size=2**17):
+        """
+        Iterate over a table in pandas.DataFrame batches.
+
+        Parameters
+        ----------
+        table : str
+            'inputs' or 'outputs'.
+        columns : list of str
+            Columns to read. If None, all columns are read.
+        runs : str or list of str
+            Runs to read. If None, all runs are read.
+        filter : pyarrow.dataset.Expression
+            Row filter, e.g. `pyarrow.dataset.field('pH') > 8`.
+        batch_size : int
+            Maximum number of rows in each batch.
+
+        Yields
+        ------
+        pandas.DataFrame
+        """
+        scanner = self.dataset(table).scanner(columns=columns, filter=self._filter(runs, filter),
+                                              batch_size=batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def read(self, table='outputs', columns=None, runs=None, filter=None):
+        """
+        Read (part of) a table into a pandas.DataFrame.
+
+        Parameters are as in `iter_batches`.
+        """
+        return self.dataset(table).to_table(columns=columns, filter=self._filter(runs, filter)).to_pandas()
+
+    def summary(self, columns=None, table='outputs', runs=None, filter=None,
+                quantiles=(0.025, 0.5, 0.975), batch_size=2**17, nbins=10000):
+        """
+        Summary statistics of numeric columns, computed one batch at a time.
+
+        Parameters
+        ----------
+        columns : list of str
+            Columns to summarise. If None, all numeric columns.
+        table, runs, filter, batch_size
+            As in `iter_batches`.
+        quantiles : array-like
+            Quantiles (0-1) to report.
+        nbins : int
+            Number of histogram bins used to estimate quantiles.
+            See `otools.geochem.ensemble.RunningStats`.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Indexed by column, with the number of finite values, mean, std,
+            min, max and each of the quantiles.
+        """
+        from ..geochem.ensemble import RunningStats
+
+        if columns is None:
+            pa = _pyarrow()
+            schema = self.dataset(table).schema
+            columns = [f.name for f in schema if pa.types.is_floating(f.type)]
+
+        stats = {c: RunningStats(nbins=nbins) for c in columns}
+        for batch in self.iter_batches(table, columns=columns, runs=runs, filter=filter,
+                                       batch_size=batch_size):
+            for c, s in stats.items():
+                s.update(batch[c].values)
+
+        out = pd.DataFrame({c: [s.n, s.mean, s.std, s.min, s.max, *s.quantile(quantiles)]
+                            for c, s in stats.items()},
+                           index=['n', 'mean', 'std', 'min', 'max'] + [f'{100 * q:g}%' for q in quantiles]).T
+        out['n'] = out['n'].astype(int)
+        return out
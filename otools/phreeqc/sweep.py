@@ -0,0 +1,179 @@
+"""
+Single-run PHREEQC parameter sweeps.
+
+When only one variable changes between points (adding CO2, titrating pH,
+changing a total), the series can be written as incremental steps from
+one base solution, rather than as independent SOLUTION blocks. PHREEQC
+then starts each step from the previous equilibrium, which converges
+much faster than re-equilibrating every point from scratch.
+
+Each function returns an input string for `run_phreeqc`. Pass its output
+through `sweep_output` to get one row per sweep point, in the same
+form as the output of an `input_str` calculation.
+"""
+import numpy as np
+
+from .phreeq import make_solution, selected_output
+
+# pseudo-phase used to fix pH by adding or removing a titrant
+fix_pH_phase = """PHASES
+Fix_H+
+    H+ = H+
+    log_k 0.0
+"""
+
+
+def _reactant_lines(reactants):
+    if isinstance(reactants, str):
+        reactants = {reactants: 1.0}
+    return [f'    {k:20s}{float(v):.8e}' for k, v in reactants.items()]
+
+
+def reaction_sweep_str(inputs, reactants, amounts, units='mmol', outputs=None):
+    """
+    Sweep the addition of reactants to a base solution, as REACTION steps.
+
+    Parameters
+    ----------
+    inputs : dict
+        PHREEQC inputs of the base solution, as in `input_str`.
+    reactants : str or dict
+        A single reactant formula or phase (e.g. 'CO2'), or a dict of
+        {reactant: relative stoichiometry}, e.g. {'NaHCO3': 1, 'CaCl2': 0.5}.
+    amounts : array-like
+        The cumulative amount of reactant added at each sweep point.
+    units : str
+        Units of amounts, e.g. 'mol', 'mmol' or 'umol'.
+    outputs : array-like or string
+        SELECTED_OUTPUT options, as in `input_str`.
+
+    Returns
+    -------
+    str : PHREEQC input string, with one reaction step per amount.
+    """
+    increments = np.diff(np.concatenate([[0], np.asarray(amounts, dtype=float)]))
+
+    lines = [make_solution(inputs, 1),
+             selected_output(outputs),
+             'INCREMENTAL_REACTIONS true',
+             'REACTION 1',
+             *_reactant_lines(reactants),
+             '    ' + ' '.join(f'{a:.8e}' for a in increments) + f' {units}',
+             'END']
+    return '\n'.join(lines)
+
+
+def pH_sweep_str(inputs, pH, titrant='NaOH', max_titrant=10., outputs=None):
+    """
+    Sweep the pH of a base solution by titration, with a Fix_H+ pseudo-phase.
+
+    Each step starts from the solution saved by the previous step, so
+    the titrant accumulates. Use a base (e.g. NaOH) for increasing pH and
+    an acid (e.g. HCl) for decreasing pH.
+
+    Parameters
+    ----------
+    inputs : dict
+        PHREEQC inputs of the base solution, as in `input_str`.
+    pH : array-like
+        Target pH of each sweep point.
+    titrant : str
+        Formula of the titrant used to reach each pH.
+    max_titrant : float
+        Moles of titrant available to each step.
+    outputs : array-like or string
+        SELECTED_OUTPUT options, as in `input_str`.
+
+    Returns
+    -------
+    str : PHREEQC input string, with one simulation per pH.
+    """
+    lines = [fix_pH_phase,
+             make_solution(inputs, 1),
+             selected_output(outputs),
+             'END']
+    for p in np.atleast_1d(pH):
+        lines += ['USE solution 1',
+                  'EQUILIBRIUM_PHASES 1',
+                  f'    Fix_H+  {-float(p):.8e}  {titrant}  {float(max_titrant):.8e}',
+                  'SAVE solution 1',
+                  'END']
+    return '\n'.join(lines)
+
+
+def modify_sweep_str(inputs, values, pH=None, titrant='HCl', max_titrant=10., outputs=None):
+    """
+    Sweep solution properties with SOLUTION_MODIFY, re-equilibrating with RUN_CELLS.
+
+    SOLUTION_MODIFY keeps total H and O fixed, so without `pH` each point
+    is at constant composition, and pH drifts as the sweep changes, e.g.
+    with temperature. This differs from an `input_str` calculation of the
+    same points, where each SOLUTION fixes the pH it is given. Pass `pH`
+    to re-impose it at each point, by titration with a Fix_H+ pseudo-phase
+    as in `pH_sweep_str`.
+
+    Parameters
+    ----------
+    inputs : dict
+        PHREEQC inputs of the base solution, as in `input_str`.
+    values : dict
+        {key: array} of values at each sweep point. Keys are either
+        SOLUTION_MODIFY options (e.g. 'temp', 'mass_water'), or element
+        names, which are set with -totals. Note that totals are in moles
+        (not concentrations), and exclude H and O. All arrays must be
+        the same length.
+    pH : float or array-like
+        If given, the pH of each sweep point, fixed by titration.
+    titrant : str
+        Formula of the titrant used to fix pH. The titrant is removed
+        to raise pH, so its ions must be present in the solution (e.g.
+        HCl in seawater).
+    max_titrant : float
+        Moles of titrant available to each step.
+    outputs : array-like or string
+        SELECTED_OUTPUT options, as in `input_str`.
+
+    Returns
+    -------
+    str : PHREEQC input string, with one simulation per sweep point.
+    """
+    options = ['temp', 'temperature', 'pe', 'mass_water', 'total_h', 'total_o', 'cb']
+    values = {k: np.atleast_1d(np.asarray(v, dtype=float)) for k, v in values.items()}
+    n = len(next(iter(values.values())))
+    if pH is not None:
+        pH = np.broadcast_to(np.asarray(pH, dtype=float), (n,))
+
+    lines = [make_solution(inputs, 1),
+             selected_output(outputs),
+             'END']
+    if pH is not None:
+        lines.insert(0, fix_pH_phase)
+    for i in range(n):
+        lines.append('SOLUTION_MODIFY 1')
+        lines += [f'    -{k:19s}{v[i]:.8e}' for k, v in values.items() if k in options]
+        totals = [f'        {k:16s}{v[i]:.8e}' for k, v in values.items() if k not in options]
+        if totals:
+            lines += ['    -totals', *totals]
+        if pH is not None:
+            lines += ['EQUILIBRIUM_PHASES 1',
+                      f'    Fix_H+  {-pH[i]:.8e}  {titrant}  {float(max_titrant):.8e}']
+        lines += ['RUN_CELLS',
+                  '    -cells 1',
+                  'END']
+    return '\n'.join(lines)
+
+
+def sweep_output(output):
+    """
+    Select one row per sweep point from the output of a sweep calculation.
+
+    Parameters
+    ----------
+    output : pandas.DataFrame
+        The output of `run_phreeqc` for a sweep input string.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    return output.loc[output['state'].str.strip() == 'react'].reset_index(drop=True)
@@ -2,3 +2,4 @@
 Tools for plotting things.
 """
 from .tools import rangecalc, spreadm, intervals
+from .raster import aggregate, shade, rasterplot
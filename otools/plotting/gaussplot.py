@@ -44,10 +44,10 @@ def gaussplot(x, y, xe, ye, n=500, pad=0.1):
     xs, ys, d : tuple of array-like
         xs and ys are coordinate arrays, d is plot image.
     """
-    xs, ys = np.meshgrid(np.linspace(x.min() - x.ptp() * pad,
-                                     x.max() + x.ptp() * pad, n),
-                         np.linspace(y.min() - y.ptp() * pad,
-                                     y.max() + y.ptp() * pad, n))
+    xs, ys = np.meshgrid(np.linspace(x.min() - np.ptp(x) * pad,
+                                     x.max() + np.ptp(x) * pad, n),
+                         np.linspace(y.min() - np.ptp(y) * pad,
+                                     y.max() + np.ptp(y) * pad, n))
     
     d = np.nansum(np.apply_along_axis(gauss2d, 0, np.vstack([x, y, xe, ye]), xs=xs, ys=ys), -1)
     
@@ -0,0 +1,189 @@
+"""
+Aggregate very large (x, y) datasets onto a fixed image, instead of scattering them.
+
+Points are binned onto a canvas with one `np.bincount` per chunk, so
+tens of millions of points (including memory-mapped arrays larger than
+memory) render in about a second, and the cost of plotting no longer
+depends on the number of points. Bins can hold point counts, sums of
+weights, or the mean of a third variable, and are colour scaled
+linearly, logarithmically, or by histogram equalisation.
+
+Example
+-------
+>>> x = np.load('Mg.npy', mmap_mode='r')
+>>> y = np.load('Sr.npy', mmap_mode='r')
+>>> ax, im = rasterplot(x, y, scale='eq_hist')
+"""
+import numpy as np
+
+from .tools import rangecalc
+
+
+def _chunks(n, chunksize):
+    for s in range(0, n, chunksize):
+        yield slice(s, min(s + chunksize, n))
+
+
+def data_range(x, pad=0.05, chunksize=1000000):
+    """
+    `rangecalc` of x, computed in chunks so memory-mapped arrays are not loaded at once.
+    """
+    mn, mx = np.inf, -np.inf
+    for s in _chunks(len(x), chunksize):
+        c = np.asarray(x[s], dtype=float)
+        c = c[np.isfinite(c)]
+        if c.size:
+            mn, mx = min(mn, c.min()), max(mx, c.max())
+    if not np.isfinite(mn):
+        raise ValueError('No finite values to calculate a range from.')
+    if mn == mx:
+        mn, mx = mn - 0.5, mx + 0.5
+    return rangecalc([mn, mx], pad)
+
+
+def aggregate(x, y, z=None, weights=None, how='count', bins=500, xlim=None, ylim=None,
+              pad=0.05, chunksize=1000000):
+    """
+    Bin (x, y) points onto a regular image.
+
+    Parameters
+    ----------
+    x, y : array-like
+        Point coordinates. May be memory-mapped, and are read chunksize at a time.
+    z : array-like
+        Values to sum or average in each bin (for how='sum' or 'mean').
+    weights : array-like
+        Point weights. Counts become sums of weights, and means are weighted.
+    how : str
+        'count', 'sum' or 'mean'.
+    bins : int or (int, int)
+        Number of bins in x and y.
+    xlim, ylim : (min, max)
+        Image limits. Default to `rangecalc` of the data. Points outside are
+        ignored, and points on the upper limits are counted in the last bins.
+    pad : float
+        Padding of the default limits.
+    chunksize : int
+        Points binned at once.
+
+    Returns
+    -------
+    (img, extent) : img has shape (ny, nx), with rows increasing in y, and
+        is NaN in empty bins for how='mean'. extent is (xmin, xmax, ymin, ymax),
+        for `plt.imshow(img, extent=extent, origin='lower')`.
+    """
+    if how not in ('count', 'sum', 'mean'):
+        raise ValueError(f"how must be 'count', 'sum' or 'mean', not '{how}'.")
+    if how != 'count' and z is None:
+        raise ValueError(f"how='{how}' needs z.")
+    n = len(x)
+    if len(y) != n or (z is not None and len(z) != n) or (weights is not None and len(weights) != n):
+        raise ValueError('x, y, z and weights must have the same length.')
+
+    nx, ny = np.broadcast_to(bins, 2).astype(int)
+    xlim = data_range(x, pad, chunksize) if xlim is None else xlim
+    ylim = data_range(y, pad, chunksize) if ylim is None else ylim
+    xscale = nx / (xlim[1] - xlim[0])
+    yscale = ny / (ylim[1] - ylim[0])
+
+    total = np.zeros(nx * ny)
+    norm = np.zeros(nx * ny) if how == 'mean' else None
+    for s in _chunks(n, chunksize):
+        xc = np.asarray(x[s], dtype=float)
+        yc = np.asarray(y[s], dtype=float)
+        # as in np.histogram2d, the last bins include their upper edges.
+        # NaN coordinates fail the comparisons, so are dropped here too
+        ok = (xc >= xlim[0]) & (xc <= xlim[1]) & (yc >= ylim[0]) & (yc <= ylim[1])
+        ix = np.clip(np.floor((xc - xlim[0]) * xscale), 0, nx - 1)
+        iy = np.clip(np.floor((yc - ylim[0]) * yscale), 0, ny - 1)
+        w = None if weights is None else np.asarray(weights[s], dtype=float)
+        if w is not None:
+            ok &= np.isfinite(w)
+        if how != 'count':
+            v = np.asarray(z[s], dtype=float)
+            ok &= np.isfinite(v)
+        flat = (iy[ok] * nx + ix[ok]).astype(np.intp)
+        w = None if w is None else w[ok]
+        if how == 'count':
+            total += np.bincount(flat, w, minlength=nx * ny)
+        else:
+            v = v[ok]
+            total += np.bincount(flat, v if w is None else v * w, minlength=nx * ny)
+            if how == 'mean':
+                norm += np.bincount(flat, w, minlength=nx * ny)
+
+    if how == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            total = np.where(norm > 0, total / norm, np.nan)
+    return total.reshape(ny, nx), (*xlim, *ylim)
+
+
+def shade(img, scale='eq_hist', empty_zero=True):
+    """
+    Scale an aggregated image to [0, 1] for colour mapping.
+
+    Parameters
+    ----------
+    img : array-like
+        From `aggregate`.
+    scale : str
+        'linear', 'log' or 'eq_hist'. Histogram equalisation maps each
+        value to its quantile among the non-empty bins, so structure is
+        visible across many orders of magnitude.
+    empty_zero : bool
+        Treat bins equal to zero as empty (NaN), so they are not drawn.
+        Appropriate for counts, but not for sums or means that can be zero.
+
+    Returns
+    -------
+    numpy.ndarray of the same shape, NaN in empty bins.
+    """
+    img = np.array(img, dtype=float)
+    empty = ~np.isfinite(img)
+    if empty_zero:
+        empty |= img == 0
+    img[empty] = np.nan
+    vals = img[~empty]
+    if vals.size == 0:
+        return img
+
+    if scale == 'log':
+        if vals.min() <= 0:
+            raise ValueError("scale='log' needs positive values.")
+        img = np.log10(img)
+        vals = np.log10(vals)
+    elif scale == 'eq_hist':
+        uniq, counts = np.unique(vals, return_counts=True)
+        cdf = np.cumsum(counts) - counts / 2
+        return np.interp(img, uniq, cdf / cdf[-1] if uniq.size > 1 else np.ones(1))
+    elif scale != 'linear':
+        raise ValueError(f"scale must be 'linear', 'log' or 'eq_hist', not '{scale}'.")
+
+    lo, hi = vals.min(), vals.max()
+    return (img - lo) / (hi - lo) if hi > lo else np.where(empty, np.nan, 1.)
+
+
+def rasterplot(x, y, z=None, weights=None, how='count', scale='eq_hist', bins=500, xlim=None,
+               ylim=None, ax=None, cmap='viridis', chunksize=1000000, pad=0.05, **kwargs):
+    """
+    Plot an aggregated image of (x, y) points.
+
+    Parameters are as `aggregate` and `shade`. Other kwargs are passed to
+    `ax.imshow`. Axis limits are set to the image extent.
+
+    Returns
+    -------
+    (ax, im) : the axes and the `AxesImage`. The unscaled image from
+        `aggregate` is kept as `im.aggregate`.
+    """
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        _, ax = plt.subplots()
+    img, extent = aggregate(x, y, z, weights, how, bins, xlim, ylim, pad, chunksize)
+    im = ax.imshow(shade(img, scale, empty_zero=how == 'count'), extent=extent, origin='lower',
+                   aspect='auto', cmap=cmap, interpolation='nearest', **kwargs)
+    im.aggregate = img
+    ax.set_xlim(extent[:2])
+    ax.set_ylim(extent[2:])
+    return ax, im
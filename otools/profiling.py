@@ -0,0 +1,258 @@
+"""
+Opt-in timing instrumentation for otools.
+
+Key stages of `otools.phreeqc`, `otools.mcmc` and `otools.bootstrap` are
+wrapped in named spans. Spans are ignored unless profiling is enabled,
+and then record nested wall times, call counts and (optionally) the net
+change in memory traced by tracemalloc.
+
+Spans cost a few microseconds each when enabled, so they wrap whole
+stages (a PHREEQC run, an MCMC fit), not functions called in inner loops.
+
+Example
+-------
+>>> from otools import profiling
+>>> profiling.enable()
+>>> out = run_phreeqc(mc_input_str(inputs, 1000))
+>>> profiling.summary()
+>>> profiling.to_chrome_trace('trace.json')  # open in chrome://tracing or Perfetto
+
+Your own code can be included with `span` or `instrument`:
+
+>>> with profiling.span('my stage'):
+...     ...
+"""
+import os
+import json
+import time
+import threading
+import functools
+import tracemalloc
+
+_state = {'enabled': False, 'memory': False, 'max_events': 100000}
+_local = threading.local()
+_lock = threading.Lock()
+_nodes = {}
+_events = []
+_t0 = time.perf_counter()
+
+
+def enable(memory=False, max_events=100000):
+    """
+    Start recording spans.
+
+    Parameters
+    ----------
+    memory : bool
+        If True, also record the net change in traced memory over each
+        span (mem_delta), with tracemalloc. This is memory still held at
+        the end of the span, not the total allocated within it, and can
+        be negative. Tracing slows down allocation-heavy code considerably.
+    max_events : int
+        Maximum number of individual spans kept for `to_chrome_trace`.
+        Totals in `report` and `summary` are always complete.
+    """
+    _state.update(enabled=True, memory=memory, max_events=max_events)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state['started_tracemalloc'] = True
+
+
+def disable():
+    """
+    Stop recording spans. Recorded results are kept until `reset`.
+    """
+    _state['enabled'] = False
+    if _state.pop('started_tracemalloc', False):
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _state['enabled']
+
+
+def reset():
+    """
+    Discard all recorded results.
+    """
+    global _t0
+    with _lock:
+        _nodes.clear()
+        _events.clear()
+        _t0 = time.perf_counter()
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'path', 'start', 'mem')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = _stack()
+        self.path = (stack[-1].path if stack else ()) + (self.name,)
+        stack.append(self)
+        self.mem = tracemalloc.get_traced_memory()[0] if _state['memory'] and tracemalloc.is_tracing() else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        dt = end - self.start
+        dmem = tracemalloc.get_traced_memory()[0] - self.mem if self.mem is not None else 0
+        _stack().pop()
+        with _lock:
+            node = _nodes.get(self.path)
+            if node is None:
+                node = _nodes[self.path] = {'count': 0, 'time': 0., 'min': float('inf'),
+                                            'max': 0., 'mem_delta': 0}
+            node['count'] += 1
+            node['time'] += dt
+            node['min'] = min(node['min'], dt)
+            node['max'] = max(node['max'], dt)
+            node['mem_delta'] += dmem
+            if len(_events) < _state['max_events']:
+                _events.append((self.name, self.start, dt, threading.get_ident(), dmem, self.args))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null = _NullSpan()
+
+
+def span(name, **args):
+    """
+    Context manager that records a named span, if profiling is enabled.
+
+    Parameters
+    ----------
+    name : str
+        Name of the span. Spans opened inside it are recorded as its children.
+    **args
+        Extra information shown with the span in Chrome traces.
+    """
+    if not _state['enabled']:
+        return _null
+    return _Span(name, args)
+
+
+def instrument(name=None):
+    """
+    Decorator that records every call of a function as a span.
+
+    Parameters
+    ----------
+    name : str
+        Name of the span. Defaults to the function's module and name.
+    """
+    def decorator(fn):
+        label = name or f"{fn.__module__.replace('otools.', '')}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return fn(*args, **kwargs)
+            with _Span(label, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def report():
+    """
+    Recorded results as a nested dict.
+
+    Returns
+    -------
+    dict
+        {name: {'count', 'time', 'min', 'max', 'mem_delta', 'children'}}, where
+        times are in seconds, mem_delta is the net change in traced memory
+        (bytes) and children has the same structure.
+    """
+    with _lock:
+        nodes = sorted(_nodes.items())
+    root = {}
+    for path, node in nodes:
+        level = root
+        for name in path[:-1]:
+            level = level.setdefault(name, {'count': 0, 'time': 0., 'min': 0., 'max': 0.,
+                                            'mem_delta': 0, 'children': {}})['children']
+        level.setdefault(path[-1], {'children': {}}).update(node)
+    return root
+
+
+def summary():
+    """
+    Recorded results as a pandas.DataFrame, with one row per span path.
+
+    Columns are count, total time, mean, min and max time (s), the share of
+    the parent's time, and the net change in traced memory in bytes
+    (mem_delta, if memory was recorded).
+    """
+    import pandas as pd
+
+    with _lock:
+        nodes = sorted(_nodes.items())
+    totals = {p: n['time'] for p, n in nodes}
+    rows = []
+    for path, n in nodes:
+        parent = totals.get(path[:-1])
+        rows.append({'span': '  ' * (len(path) - 1) + path[-1],
+                     'count': n['count'],
+                     'total': n['time'],
+                     'mean': n['time'] / n['count'],
+                     'min': n['min'],
+                     'max': n['max'],
+                     'of_parent': n['time'] / parent if parent else float('nan'),
+                     'mem_delta': n['mem_delta']})
+    return pd.DataFrame(rows, columns=['span', 'count', 'total', 'mean', 'min', 'max',
+                                       'of_parent', 'mem_delta']).set_index('span')
+
+
+def to_json(path=None):
+    """
+    `report` as a JSON string, optionally written to path.
+    """
+    s = json.dumps(report(), indent=1)
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(s)
+    return s
+
+
+def to_chrome_trace(path=None):
+    """
+    Recorded spans in Chrome trace event format.
+
+    Open the file in chrome://tracing or https://ui.perfetto.dev.
+
+    Returns
+    -------
+    dict : the trace, which is also written to path if given.
+    """
+    pid = os.getpid()
+    with _lock:
+        events = [{'name': name, 'ph': 'X', 'ts': (start - _t0) * 1e6, 'dur': dt * 1e6,
+                   'pid': pid, 'tid': tid, 'args': {**args, 'mem_delta': dmem}}
+                  for name, start, dt, tid, dmem, args in _events]
+    trace = {'traceEvents': events, 'displayTimeUnit': 'ms'}
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+    return trace
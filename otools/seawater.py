@@ -1,9 +1,193 @@
+"""
+Seawater composition, and vectorised generation of modified seawaters.
+
+Concentrations are in mol/kg at a salinity of 35, from Bruland and Lohan (2003).
+`load` returns the table as stored, where dissolved N2, nitrate and O2 are
+'N2', 'NO3' and 'O'. The other functions name them as PHREEQC SOLUTION
+entries, 'N(0)', 'N(5)' and 'O(0)', so their tables can be passed straight
+to `otools.phreeqc.input_str`, and accept either name as input.
+"""
+import functools
 import importlib.resources as resources
+import numpy as np
 import pandas as pd
 
 package_path = resources.files('otools')
 
-def load():
+unit_factors = {'mol/kgw': 1., 'mmol/kgw': 1e3, 'umol/kgw': 1e6}
+
+aliases = {'N2': 'N(0)', 'NO3': 'N(5)', 'O': 'O(0)'}
+
+
+def _names(names):
+    return [aliases.get(n, n) for n in names]
+
+
+def _rename(d):
+    return None if d is None else {aliases.get(k, k): v for k, v in d.items()}
+
+
+@functools.lru_cache()
+def _load():
     f = package_path / 'seawater/seawater.csv'
-    
-    return pd.read_csv(f, comment='#').set_index('name')
\ No newline at end of file
+    return pd.read_csv(f, comment='#').set_index('name')
+
+
+@functools.lru_cache()
+def _load_phreeqc():
+    return _load().rename(index=aliases)
+
+
+def load():
+    """
+    Load the standard seawater composition.
+
+    The CSV is only read once per session. A copy is returned, so
+    it is safe to modify.
+
+    Returns
+    -------
+    pandas.DataFrame indexed by name, with columns (element, value, min, max)
+    """
+    return _load().copy()
+
+
+def bounds(S=35., elements=None, units='mol/kgw'):
+    """
+    The min/max concentration range of each component of seawater.
+
+    Where no range is given in the data, min and max equal the value.
+
+    Parameters
+    ----------
+    S : float
+        Salinity. Ranges are scaled by S / 35.
+    elements : list of str
+        Names of the components to return. If None, all components
+        with a value or range are returned.
+    units : str
+        One of 'mol/kgw', 'mmol/kgw' or 'umol/kgw'.
+
+    Returns
+    -------
+    pandas.DataFrame indexed by name, with columns (min, max)
+    """
+    sw = _load_phreeqc()
+    if elements is not None:
+        sw = sw.loc[_names(elements)]
+    b = pd.DataFrame({'min': sw['min'].fillna(sw['value']),
+                      'max': sw['max'].fillna(sw['value'])})
+    b = b.dropna(how='all')
+    return b * S / 35. * unit_factors[units]
+
+
+def _broadcast(kwargs):
+    """
+    Broadcast all condition arrays in a {key: {name: array}} dict together.
+    """
+    flat = [np.asarray(v, dtype=float) for d in kwargs.values() for v in d.values()]
+    shape = np.broadcast_shapes(*(a.shape for a in flat)) if flat else ()
+    return {k: {n: np.broadcast_to(np.asarray(v, dtype=float), shape).ravel()
+                for n, v in d.items()} for k, d in kwargs.items()}, int(np.prod(shape))
+
+
+def compositions(S=35., values=None, scale=None, ratios=None, ratio_to='Ca',
+                 elements=None, units='mol/kgw', include_units=True):
+    """
+    Generate a table of seawater compositions over arrays of conditions.
+
+    All condition arrays are broadcast together, and each element of the
+    broadcast shape becomes one row of the output. Modifications are applied
+    in order: salinity scaling, then `values`, then `scale`, then `ratios`.
+
+    Parameters
+    ----------
+    S : float or array-like
+        Salinity. All concentrations are scaled by S / 35.
+    values : dict
+        {name: concentration} absolute concentrations (in `units`), overriding
+        the standard composition, e.g. {'Ca': [0.01, 0.02]}.
+    scale : dict
+        {name: factor} multiplies the concentration of each named component.
+    ratios : dict
+        {name: ratio} sets each named component to ratio * [ratio_to], in
+        mol/mol. E.g. ratios={'Mg': np.linspace(1, 5, 20), 'Sr': 8.5e-3}.
+    ratio_to : str
+        The denominator of `ratios`.
+    elements : list of str
+        Names of the components to include. If None, all components with
+        a value are included.
+    units : str
+        One of 'mol/kgw', 'mmol/kgw' or 'umol/kgw'.
+    include_units : bool
+        If True, a 'units' column is added, so the table can be passed
+        straight to `otools.phreeqc.input_str`.
+
+    Returns
+    -------
+    pandas.DataFrame with one column per component and one row per condition.
+    """
+    sw = _load_phreeqc()['value']
+    elements = list(sw.dropna().index) if elements is None else _names(elements)
+    values, scale, ratios = _rename(values), _rename(scale), _rename(ratios)
+    ratio_to = aliases.get(ratio_to, ratio_to)
+    if ratios and ratio_to not in elements:
+        elements.append(ratio_to)
+    for d in (values, scale, ratios):
+        if d is not None:
+            elements += [k for k in d if k not in elements]
+
+    conds, n = _broadcast({'S': {'S': S}, 'values': values or {},
+                           'scale': scale or {}, 'ratios': ratios or {}})
+    factor = unit_factors[units]
+
+    out = {}
+    for el in elements:
+        out[el] = np.full(n, sw.get(el, np.nan) * factor) * conds['S']['S'] / 35.
+    for el, v in conds['values'].items():
+        out[el] = v.copy()
+    for el, v in conds['scale'].items():
+        out[el] *= v
+    for el, v in conds['ratios'].items():
+        out[el] = v * out[ratio_to]
+
+    out = pd.DataFrame(out)
+    if include_units:
+        out['units'] = units
+    return out
+
+
+def sample(N, elements=None, S=35., units='mol/kgw', include_units=True, random_state=None):
+    """
+    Draw random seawater compositions within the min/max range of each component.
+
+    Components without a range keep their standard value.
+
+    Parameters
+    ----------
+    N : int
+        The number of compositions to draw.
+    elements : list of str
+        Names of the components to include. If None, all components are included.
+    S : float or array-like
+        Salinity, as in `bounds`. If array-like, must be of length N.
+    units : str
+        One of 'mol/kgw', 'mmol/kgw' or 'umol/kgw'.
+    include_units : bool
+        If True, a 'units' column is added.
+    random_state : None, int or numpy.random.Generator
+        Seed for the random draws.
+
+    Returns
+    -------
+    pandas.DataFrame with one column per component and N rows.
+    """
+    rng = np.random.default_rng(random_state)
+    b = bounds(elements=elements, units=units)
+    u = rng.uniform(size=(int(N), len(b)))
+    draws = (b['min'].values + u * (b['max'] - b['min']).values) * np.reshape(S, (-1, 1)) / 35.
+
+    out = pd.DataFrame(draws, columns=list(b.index))
+    if include_units:
+        out['units'] = units
+    return out
@@ -87,8 +87,10 @@ setup(
     # installed, specify them here.  If using Python 2.6 or less, then these
     # have to be included in MANIFEST.in as well.
     package_data={
-        'otools': ['periodic_table/elements.pkl',
-                   'elements.pkl'],
+        'otools': ['periodic_table/elements.npz',
+                   'periodic_table/periodic_table.npz',
+                   'seawater/seawater.csv',
+                   'phreeqc/resources/database/*.dat'],
     },
 
     # Although 'package_data' is the preferred approach, in some case you may
@@ -100,9 +102,9 @@ setup(
     # To provide executable scripts, use entry points in preference to the
     # "scripts" keyword. Entry points provide cross-platform support and allow
     # pip to create the appropriate form of executable for the target platform.
-    # entry_points={
-    #     'console_scripts': [
-    #         'sample=sample:main',
-    #     ],
-    # },
+    entry_points={
+        'console_scripts': [
+            'otools-speciate=otools.phreeqc.cli:main',
+        ],
+    },
 )
\ No newline at end of file
@@ -1,7 +1,24 @@
+import numpy as np
 import pandas as pd
-import uncertainty_helpers as un
+import uncertainties as un
 import uncertainties.unumpy as unp
 
+
+def _has_uncertainties(d):
+    """
+    True if any value in the Series is an uncertainties object.
+    """
+    if d.dtype != object:
+        return False
+    return any(isinstance(v, un.core.AffineScalarFunc) for v in d.values)
+
+
+def _column_names(columns):
+    if columns.nlevels == 2 and all(n is None for n in columns.names):
+        return ['Element', 'Unit', 'Type']
+    return [n for n in columns.names] + ['Type']
+
+
 def df_separate_uncertainties(df):
     """Create a copy of a dataframe where all columns containing uncertainties are split into two columns, one for the nominal value and one for the standard deviation.
 
@@ -9,20 +26,53 @@ def df_separate_uncertainties(df):
     ----------
     df : pandas.DataFrame
         A pandas dataframe where some of the columns are uncertainties.unumpy.uarrays.
-        
+
     Returns
     -------
     A copy of the dataframe with an additional level added to the column index identifying the 'mean' and 'std' values.
     """
-    
-    sdf = pd.DataFrame(index=df.index, columns=pd.MultiIndex(levels=[[],[],[]], codes=[[],[],[]], names=['Element', 'Unit', 'Type']))
-
+    keys = []
+    arrays = []
     for c, d in df.items():
-        if isinstance(d.iloc[0], un.core.AffineScalarFunc):
-            sdf.loc[:, (*c, 'mean')] = unp.nominal_values(d)
-            sdf.loc[:, (*c, 'std')] = unp.std_devs(d)
+        c = c if isinstance(c, tuple) else (c,)
+        if _has_uncertainties(d):
+            keys += [(*c, 'mean'), (*c, 'std')]
+            arrays += [unp.nominal_values(d.values), unp.std_devs(d.values)]
         else:
-            sdf.loc[:, (*c, '')] = d
-     
-    return sdf
-    
\ No newline at end of file
+            keys.append((*c, ''))
+            arrays.append(d.values)
+
+    columns = pd.MultiIndex.from_tuples(keys, names=_column_names(df.columns))
+    return pd.DataFrame(dict(zip(keys, arrays)), index=df.index, columns=columns)
+
+
+def df_combine_uncertainties(sdf):
+    """Reverse of `df_separate_uncertainties`. Columns split into 'mean' and 'std' are recombined into single columns of uncertainties.unumpy.uarrays.
+
+    Parameters
+    ----------
+    sdf : pandas.DataFrame
+        A pandas dataframe where the last level of the column index identifies 'mean' and 'std' values.
+
+    Returns
+    -------
+    A copy of the dataframe with the last level of the column index removed.
+    """
+    keys = []
+    arrays = []
+    for c in sdf.columns:
+        key, kind = c[:-1], c[-1]
+        if kind == 'mean':
+            std = sdf[(*key, 'std')].values if (*key, 'std') in sdf.columns else np.zeros(len(sdf))
+            arrays.append(unp.uarray(sdf[c].values, std))
+        elif kind == 'std' and (*key, 'mean') in sdf.columns:
+            continue
+        else:
+            arrays.append(sdf[c].values)
+        keys.append(key)
+
+    if sdf.columns.nlevels == 2:
+        columns = pd.Index([k[0] for k in keys])
+    else:
+        columns = pd.MultiIndex.from_tuples(keys, names=sdf.columns.names[:-1])
+    return pd.DataFrame(dict(zip(range(len(keys)), arrays)), index=sdf.index).set_axis(columns, axis=1)